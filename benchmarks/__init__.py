@@ -0,0 +1,18 @@
+"""
+Benchmarks for the Star Wars API. Run them from the repository root, e.g.:
+
+    python -m benchmarks.seed --reset      # reproducible data set in DATABASE_URL
+    python -m benchmarks.micro             # in-process, through the Flask test client
+    python -m benchmarks.load              # HTTP load against gunicorn wsgi:application
+    python -m benchmarks.login
+
+micro and load print p50/p95/p99 latency and req/s as JSON; --output saves a
+baseline and --baseline compares against one (exit code 1 on regressions).
+"""
+import os
+import sys
+
+# Los módulos de la API se importan igual que en src/ (from models import ...)
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
@@ -0,0 +1,162 @@
+"""
+HTTP load test: starts `gunicorn wsgi:application` on the seeded database
+(or targets --url) and drives it from several client processes, each one
+with a keep-alive connection, through a mix of read endpoints.
+
+    DATABASE_URL=sqlite:////tmp/bench.db python -m benchmarks.load --workers 4 --clients 8
+    python -m benchmarks.load --url http://127.0.0.1:3000 --baseline load-baseline.json
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import urllib.parse
+
+from benchmarks import SRC_DIR
+from benchmarks.seed import BENCHMARK_PASSWORD, user_email
+from benchmarks.stats import add_report_arguments, report, summarize
+
+# Caso -> ruta; los IDs se eligen al azar entre 1 y --max-id
+SCENARIOS = {
+    'list_characters': lambda rng, max_id: '/characters?limit=50',
+    'list_planets_filtered': lambda rng, max_id: '/planets?climate=arid&sort=-population&limit=20',
+    'get_character': lambda rng, max_id: f'/character/{rng.randint(1, max_id)}',
+    'get_planet': lambda rng, max_id: f'/planet/{rng.randint(1, max_id)}',
+    'user_favorites': lambda rng, max_id: '/users/favorites',
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_gunicorn(port, workers, threads):
+    env = dict(os.environ, RATELIMIT_ENABLED='0')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'wsgi:application', '--chdir', SRC_DIR,
+         '--bind', f'127.0.0.1:{port}', '--workers', str(workers), '--threads', str(threads),
+         '--log-level', 'warning'],
+        env=env
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process
+        except OSError:
+            if process.poll() is not None:
+                sys.exit("gunicorn exited before accepting connections")
+            time.sleep(0.2)
+    process.terminate()
+    sys.exit("gunicorn did not start in 30 seconds")
+
+
+def login(url, user_index):
+    target = urllib.parse.urlsplit(url)
+    connection = http.client.HTTPConnection(target.hostname, target.port, timeout=30)
+    body = json.dumps({'email': user_email(user_index), 'password': BENCHMARK_PASSWORD})
+    connection.request('POST', '/token', body, {'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    data = response.read()
+    connection.close()
+    if response.status != 200:
+        raise RuntimeError(f"Login as {user_email(user_index)} failed with {response.status}: {data!r}")
+    return json.loads(data)['token']
+
+
+# Proceso cliente: devuelve {caso: [latencias]} y el número de errores por caso
+def client_process(url, token, seconds, scenarios, max_id, client_seed):
+    rng = random.Random(client_seed)
+    target = urllib.parse.urlsplit(url)
+    connection = http.client.HTTPConnection(target.hostname, target.port, timeout=30)
+    headers = {'Authorization': f'Bearer {token}'}
+    latencies = {name: [] for name in scenarios}
+    errors = {name: 0 for name in scenarios}
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        name = rng.choice(scenarios)
+        path = SCENARIOS[name](rng, max_id)
+        began = time.perf_counter()
+        try:
+            connection.request('GET', path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            errors[name] += 1
+            connection.close()
+            continue
+        latency = time.perf_counter() - began
+        # 404 es una respuesta válida para IDs que no existen
+        if response.status in (200, 404):
+            latencies[name].append(latency)
+        else:
+            errors[name] += 1
+    connection.close()
+    return latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='existing server to test; by default gunicorn is started here')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='gunicorn workers')
+    parser.add_argument('--threads', type=int, default=1, help='gunicorn threads per worker')
+    parser.add_argument('--clients', type=int, default=(os.cpu_count() or 1) * 2, help='client processes')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--max-id', type=int, default=60, help='highest character/planet id to request')
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='only run these scenarios (repeatable)')
+    add_report_arguments(parser)
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        port = free_port()
+        server = start_gunicorn(port, args.workers, args.threads)
+        url = f'http://127.0.0.1:{port}'
+
+    scenarios = args.scenario or sorted(SCENARIOS)
+    try:
+        # Un usuario por cliente, para que el límite por usuario (si lo hay) no se comparta
+        tokens = [login(url, index) for index in range(args.clients)]
+        start = time.perf_counter()
+        with multiprocessing.Pool(args.clients) as pool:
+            outcomes = pool.starmap(client_process, [
+                (url, tokens[index], args.seconds, scenarios, args.max_id, index)
+                for index in range(args.clients)
+            ])
+        elapsed = time.perf_counter() - start
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    results = {}
+    for name in scenarios:
+        latencies = [value for outcome, _ in outcomes for value in outcome[name]]
+        errors = sum(outcome_errors[name] for _, outcome_errors in outcomes)
+        results[name] = summarize(latencies, elapsed, errors)
+    all_latencies = [value for outcome, _ in outcomes for values in outcome.values() for value in values]
+    all_errors = sum(sum(outcome_errors.values()) for _, outcome_errors in outcomes)
+    results['total'] = summarize(all_latencies, elapsed, all_errors)
+
+    sys.exit(report(results, args, {
+        'benchmark': 'load',
+        'url': url if args.url else 'gunicorn wsgi:application',
+        'workers': None if args.url else args.workers,
+        'threads': None if args.url else args.threads,
+        'clients': args.clients,
+        'seconds': args.seconds,
+    }))
+
+
+if __name__ == '__main__':
+    main()
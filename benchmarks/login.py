@@ -0,0 +1,64 @@
+"""
+Login throughput: password verifications per second with the configured KDF,
+first on one thread and then through PasswordVerifier with several threads.
+
+    python -m benchmarks.login --threads 4 --seconds 5
+    PASSWORD_HASH_METHOD=pbkdf2:sha256:600000 python -m benchmarks.login
+"""
+import argparse
+import json
+import os
+import threading
+import time
+
+from benchmarks import SRC_DIR  # noqa: F401 (añade src/ al path)
+from passwords import PASSWORD_HASH_METHOD, PasswordVerifier, hash_password, verify_password
+
+
+def run_single(stored, seconds):
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        verify_password(stored, 'correct horse battery staple')
+        count += 1
+    return count / seconds
+
+
+def run_pool(stored, seconds, threads):
+    verifier = PasswordVerifier(workers=threads, queue_size=threads)
+    counts = [0] * threads
+    deadline = time.perf_counter() + seconds
+
+    def client(index):
+        while time.perf_counter() < deadline:
+            verifier.verify(stored, 'correct horse battery staple')
+            counts[index] += 1
+
+    clients = [threading.Thread(target=client, args=(index,)) for index in range(threads)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    return sum(counts) / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--seconds', type=float, default=3)
+    args = parser.parse_args()
+
+    stored = hash_password('correct horse battery staple')
+    single = run_single(stored, args.seconds)
+    pooled = run_pool(stored, args.seconds, args.threads)
+    print(json.dumps({
+        'method': PASSWORD_HASH_METHOD,
+        'logins_per_sec_single_thread': round(single, 2),
+        'threads': args.threads,
+        'logins_per_sec_pool': round(pooled, 2),
+        'logins_per_sec_per_core': round(pooled / min(args.threads, os.cpu_count() or 1), 2),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Micro-benchmarks through Flask's test client (no network, one process):
+serialization, JWT verification and the main read endpoints, with the caches
+warm and cold. Seed the database first with benchmarks.seed.
+
+    DATABASE_URL=sqlite:////tmp/bench.db python -m benchmarks.micro --output baseline.json
+    DATABASE_URL=sqlite:////tmp/bench.db python -m benchmarks.micro --baseline baseline.json
+"""
+import argparse
+import os
+import sys
+import time
+
+# El límite de peticiones falsearía las medidas
+os.environ.setdefault('RATELIMIT_ENABLED', '0')
+
+from benchmarks import SRC_DIR  # noqa: F401,E402 (añade src/ al path)
+from benchmarks.stats import add_report_arguments, report, summarize  # noqa: E402
+
+
+def measure(function, seconds, warmup=20):
+    for _ in range(warmup):
+        function()
+    latencies = []
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        began = time.perf_counter()
+        function()
+        latencies.append(time.perf_counter() - began)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def request_case(client, path, headers, before=None):
+    def run():
+        if before is not None:
+            before()
+        response = client.get(path, headers=headers)
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {path} returned {response.status_code}")
+    return run
+
+
+def build_cases(app):
+    from flask_jwt_extended import create_access_token, decode_token
+    from app import jwt, cache_backend, character_cache, planet_cache
+    from invalidation import favorites_namespace
+    from models import db, Characters, Users
+    from serializers import character_serializer
+
+    client = app.test_client()
+    with app.app_context():
+        user_id = db.session.scalar(db.select(Users.user_id).order_by(Users.user_id))
+        character_id = db.session.scalar(db.select(Characters.character_id).order_by(Characters.character_id))
+        if user_id is None or character_id is None:
+            sys.exit("The database is empty, run `python -m benchmarks.seed` first")
+        token = create_access_token(identity=user_id)
+        rows = db.session.execute(
+            db.select(*character_serializer.columns_for(character_serializer.fields)).limit(100)
+        ).all()
+    headers = {'Authorization': f'Bearer {token}'}
+
+    def cold_caches():
+        character_cache.invalidate()
+        planet_cache.invalidate()
+        cache_backend.bump_version(favorites_namespace(user_id))
+
+    def serialize_rows():
+        app.json.dumps(character_serializer.many(rows))
+
+    def decode(clear_cache):
+        def run():
+            if clear_cache:
+                jwt.token_cache.clear()
+            with app.app_context():
+                decode_token(token)
+        return run
+
+    return {
+        'serialize_100_characters': serialize_rows,
+        'jwt_decode_cold': decode(True),
+        'jwt_decode_cached': decode(False),
+        'get_character_cold': request_case(client, f'/character/{character_id}', headers, cold_caches),
+        'get_character_cached': request_case(client, f'/character/{character_id}', headers),
+        'list_characters_cold': request_case(client, '/characters?limit=50', headers, cold_caches),
+        'list_characters_cached': request_case(client, '/characters?limit=50', headers),
+        'list_planets_filtered_cold': request_case(
+            client, '/planets?climate=arid&sort=-population&limit=20', headers, cold_caches),
+        'user_favorites_cold': request_case(client, '/users/favorites', headers, cold_caches),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=2, help='duration of each case')
+    parser.add_argument('--case', action='append', help='run only these cases (repeatable)')
+    add_report_arguments(parser)
+    args = parser.parse_args()
+
+    from app import app
+    cases = build_cases(app)
+    results = {}
+    for name, function in cases.items():
+        if args.case and name not in args.case:
+            continue
+        results[name] = measure(function, args.seconds)
+
+    sys.exit(report(results, args, {
+        'benchmark': 'micro',
+        'database': app.config['SQLALCHEMY_DATABASE_URI'].split('://')[0],
+        'seconds_per_case': args.seconds,
+    }))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Seed the database in DATABASE_URL (SQLite or Postgres) with a reproducible
+data set for the benchmarks. Every user gets the password "benchmark" and
+the emails are user0@example.com, user1@example.com...
+
+    DATABASE_URL=sqlite:////tmp/bench.db python -m benchmarks.seed --reset
+    python -m benchmarks.seed --users 1000 --planets 500 --characters 5000 --favorites 20
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import time
+
+os.environ.setdefault('RATELIMIT_ENABLED', '0')
+
+from benchmarks import SRC_DIR  # noqa: F401,E402 (añade src/ al path)
+from sqlalchemy import insert  # noqa: E402
+
+BENCHMARK_PASSWORD = 'benchmark'
+CLIMATES = ('arid', 'temperate', 'frozen', 'tropical', 'murky')
+TERRAINS = ('desert', 'grasslands', 'tundra', 'jungle', 'swamp', 'ocean')
+SPECIES = ('human', 'droid', 'wookiee', 'rodian', 'twi\'lek')
+GENDERS = ('male', 'female', 'n/a')
+BATCH_SIZE = 1000
+
+
+def user_email(index):
+    return f'user{index}@example.com'
+
+
+def insert_batches(db, model, rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.session.execute(insert(model), rows[start:start + BATCH_SIZE])
+
+
+def seed(app, users=100, planets=60, characters=300, favorites=10, random_seed=42, reset=False):
+    from models import db, Users, Planets, Characters, Favorites, resolve_homeworld_ids, rebuild_favorites_counts
+    from passwords import hash_password
+
+    rng = random.Random(random_seed)
+    with app.app_context():
+        if reset:
+            db.drop_all()
+        db.create_all()
+
+        # El KDF es lento: todos los usuarios comparten el mismo hash
+        password_hash = hash_password(BENCHMARK_PASSWORD)
+        now = datetime.datetime.now()
+        insert_batches(db, Users, [
+            {'email': user_email(index), 'password_hash': password_hash,
+             'username': f'user{index}', 'user_creation_date': now}
+            for index in range(users)
+        ])
+        planet_names = [f'Planet {index}' for index in range(planets)]
+        insert_batches(db, Planets, [
+            {'name': name, 'climate': rng.choice(CLIMATES), 'terrain': rng.choice(TERRAINS),
+             'population': rng.randrange(0, 10 ** 9)}
+            for name in planet_names
+        ])
+        insert_batches(db, Characters, [
+            {'name': f'Character {index}', 'species': rng.choice(SPECIES),
+             'homeworld': rng.choice(planet_names) if planet_names else None,
+             'gender': rng.choice(GENDERS)}
+            for index in range(characters)
+        ])
+
+        user_ids = db.session.scalars(db.select(Users.user_id).order_by(Users.user_id)).all()
+        planet_ids = db.session.scalars(db.select(Planets.planet_id)).all()
+        character_ids = db.session.scalars(db.select(Characters.character_id)).all()
+        favorite_rows = []
+        for user_id in user_ids[-users:] if users else []:
+            # Mitad planetas y mitad personajes, sin repetir dentro de un usuario
+            for planet_id in rng.sample(planet_ids, min(favorites // 2, len(planet_ids))):
+                favorite_rows.append({'user_id': user_id, 'planet_id': planet_id})
+            for character_id in rng.sample(character_ids, min(favorites - favorites // 2, len(character_ids))):
+                favorite_rows.append({'user_id': user_id, 'character_id': character_id})
+        insert_batches(db, Favorites, favorite_rows)
+        # Las inserciones Core no mantienen homeworld_id ni favorites_count:
+        # sin ellos no se pueden medir residents, ?expand=homeworld ni /favorites/top
+        resolve_homeworld_ids()
+        rebuild_favorites_counts()
+
+        return {
+            'users': users, 'planets': planets, 'characters': characters,
+            'favorites': len(favorite_rows), 'seed': random_seed,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--planets', type=int, default=60)
+    parser.add_argument('--characters', type=int, default=300)
+    parser.add_argument('--favorites', type=int, default=10, help='favorites per user')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--reset', action='store_true', help='drop and recreate all tables first')
+    args = parser.parse_args()
+
+    from app import app
+    start = time.perf_counter()
+    counts = seed(app, args.users, args.planets, args.characters, args.favorites, args.seed, args.reset)
+    counts['seconds'] = round(time.perf_counter() - start, 2)
+    print(json.dumps(counts, indent=2))
+
+
+if __name__ == '__main__':
+    main()
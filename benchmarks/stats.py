@@ -0,0 +1,64 @@
+"""
+Shared reporting for the benchmarks: latency percentiles and req/s as JSON,
+and comparison against a stored baseline file.
+"""
+import json
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+# Latencias en segundos -> resumen en milisegundos
+def summarize(latencies, elapsed, errors=0):
+    values = sorted(latencies)
+    return {
+        'requests': len(values),
+        'errors': errors,
+        'req_per_sec': round(len(values) / elapsed, 2) if elapsed else 0.0,
+        'mean_ms': round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        'p50_ms': round(percentile(values, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(values, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(values, 0.99) * 1000, 3),
+    }
+
+
+# Compara cada caso con la línea base: es una regresión si p95 sube o req/s
+# baja más de `tolerance` (0.10 = 10 %). Los casos nuevos no se comparan.
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if previous['p95_ms'] and current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append({'case': name, 'metric': 'p95_ms',
+                                'baseline': previous['p95_ms'], 'current': current['p95_ms']})
+        if current['req_per_sec'] < previous['req_per_sec'] * (1 - tolerance):
+            regressions.append({'case': name, 'metric': 'req_per_sec',
+                                'baseline': previous['req_per_sec'], 'current': current['req_per_sec']})
+    return regressions
+
+
+def add_report_arguments(parser):
+    parser.add_argument('--output', help='write the results as JSON to this file (e.g. a new baseline)')
+    parser.add_argument('--baseline', help='JSON file from a previous run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='allowed slowdown before a case counts as a regression (default 0.10)')
+
+
+# Imprime el informe y devuelve el código de salida (1 si hay regresiones)
+def report(results, args, meta=None):
+    document = {'meta': meta or {}, 'results': results}
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)['results']
+        document['regressions'] = compare(results, baseline, args.tolerance)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(document, output_file, indent=2, sort_keys=True)
+    print(json.dumps(document, indent=2, sort_keys=True))
+    return 1 if document.get('regressions') else 0
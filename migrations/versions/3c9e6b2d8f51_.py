@@ -0,0 +1,30 @@
+"""empty message
+
+Revision ID: 3c9e6b2d8f51
+Revises: f4a7c2e9b1d3
+Create Date: 2026-10-17 00:18:52.604418
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9e6b2d8f51'
+down_revision = 'f4a7c2e9b1d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # En SQLite INTEGER ya es de 64 bits; recrear la tabla (batch) quitaría los
+    # triggers de búsqueda (FTS) de planets
+    if op.get_context().dialect.name != 'sqlite':
+        op.alter_column('planets', 'population', existing_type=sa.Integer(),
+                        type_=sa.BigInteger(), existing_nullable=True)
+
+
+def downgrade():
+    if op.get_context().dialect.name != 'sqlite':
+        op.alter_column('planets', 'population', existing_type=sa.BigInteger(),
+                        type_=sa.Integer(), existing_nullable=True)
@@ -0,0 +1,62 @@
+"""empty message
+
+Revision ID: 7f3c2a91b6e8
+Revises: e27b9c4a6d35
+Create Date: 2026-10-16 15:31:09.664318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7f3c2a91b6e8'
+down_revision = 'e27b9c4a6d35'
+branch_labels = None
+depends_on = None
+
+SEARCH_TABLES = (('characters', 'character_id'), ('planets', 'planet_id'))
+
+
+def upgrade():
+    # Índices de búsqueda por nombre: GIN sobre tsvector en Postgres y FTS5 en SQLite
+    dialect = op.get_bind().dialect.name
+    for table, key in SEARCH_TABLES:
+        if dialect == 'postgresql':
+            op.execute(
+                f"CREATE INDEX IF NOT EXISTS ix_{table}_name_fts ON {table} "
+                f"USING gin (to_tsvector('simple', name))"
+            )
+        elif dialect == 'sqlite':
+            op.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5("
+                f"name, content='{table}', content_rowid='{key}', "
+                f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            )
+            op.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_fts_ai AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO {table}_fts(rowid, name) VALUES (new.{key}, new.name); END"
+            )
+            op.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_fts_ad AFTER DELETE ON {table} BEGIN "
+                f"INSERT INTO {table}_fts({table}_fts, rowid, name) VALUES ('delete', old.{key}, old.name); END"
+            )
+            op.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_fts_au AFTER UPDATE OF name ON {table} BEGIN "
+                f"INSERT INTO {table}_fts({table}_fts, rowid, name) VALUES ('delete', old.{key}, old.name); "
+                f"INSERT INTO {table}_fts(rowid, name) VALUES (new.{key}, new.name); END"
+            )
+            # Indexar las filas que ya existen
+            op.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    for table, key in SEARCH_TABLES:
+        if dialect == 'postgresql':
+            op.execute(f"DROP INDEX IF EXISTS ix_{table}_name_fts")
+        elif dialect == 'sqlite':
+            op.execute(f"DROP TRIGGER IF EXISTS {table}_fts_au")
+            op.execute(f"DROP TRIGGER IF EXISTS {table}_fts_ad")
+            op.execute(f"DROP TRIGGER IF EXISTS {table}_fts_ai")
+            op.execute(f"DROP TABLE IF EXISTS {table}_fts")
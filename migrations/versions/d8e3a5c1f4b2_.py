@@ -0,0 +1,48 @@
+"""empty message
+
+Revision ID: d8e3a5c1f4b2
+Revises: b6d1e4f7a2c9
+Create Date: 2026-10-16 22:10:41.731902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8e3a5c1f4b2'
+down_revision = 'b6d1e4f7a2c9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # La columna y la FK se crean sin recrear la tabla (batch) para que en SQLite
+    # no se pierdan los triggers de búsqueda (FTS) de characters; SQLite solo
+    # admite la FK dentro del propio ADD COLUMN
+    if op.get_context().dialect.name == 'sqlite':
+        op.execute(
+            "ALTER TABLE characters ADD COLUMN homeworld_id INTEGER "
+            "REFERENCES planets (planet_id) ON DELETE SET NULL"
+        )
+    else:
+        op.add_column('characters', sa.Column('homeworld_id', sa.Integer(), nullable=True))
+        op.create_foreign_key('fk_characters_homeworld_id_planets', 'characters', 'planets',
+                              ['homeworld_id'], ['planet_id'], ondelete='SET NULL')
+    op.create_index('ix_characters_homeworld_id', 'characters', ['homeworld_id', 'character_id'], unique=False)
+
+    # Enlazar los personajes existentes por el nombre del planeta (el de menor ID si se repite)
+    op.execute(
+        "UPDATE characters SET homeworld_id = "
+        "(SELECT MIN(planets.planet_id) FROM planets WHERE planets.name = characters.homeworld)"
+    )
+
+
+def downgrade():
+    op.drop_index('ix_characters_homeworld_id', table_name='characters')
+    if op.get_context().dialect.name == 'sqlite':
+        # SQLite >= 3.35; la FK sin nombre desaparece con la columna
+        op.execute("ALTER TABLE characters DROP COLUMN homeworld_id")
+    else:
+        op.drop_constraint('fk_characters_homeworld_id_planets', 'characters', type_='foreignkey')
+        op.drop_column('characters', 'homeworld_id')
@@ -0,0 +1,28 @@
+"""empty message
+
+Revision ID: f4a7c2e9b1d3
+Revises: d8e3a5c1f4b2
+Create Date: 2026-10-16 23:42:18.315207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4a7c2e9b1d3'
+down_revision = 'd8e3a5c1f4b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('cache_versions',
+    sa.Column('namespace', sa.String(length=120), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('namespace')
+    )
+
+
+def downgrade():
+    op.drop_table('cache_versions')
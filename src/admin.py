@@ -2,6 +2,17 @@ import os
 from flask_admin import Admin
 from models import db, Users, Planets, Characters, Favorites
 from flask_admin.contrib.sqla import ModelView
+from passwords import hash_password, is_legacy_hash
+
+class UsersView(ModelView):
+    # La contraseña escrita en el formulario se guarda siempre con el KDF
+    def on_model_change(self, form, model, is_created):
+        if model.password_hash and is_legacy_hash(model.password_hash):
+            model.password_hash = hash_password(model.password_hash)
+
+class CatalogView(ModelView):
+    # El contador de favoritos lo mantiene la API, no se edita a mano
+    form_excluded_columns = ('favorites_count', 'favorites')
 
 def setup_admin(app):
     app.secret_key = os.environ.get('FLASK_APP_KEY', 'sample key')
@@ -10,9 +21,9 @@ def setup_admin(app):
 
     
     # Add your models here, for example this is how we add a the User model to the admin
-    admin.add_view(ModelView(Users, db.session))
-    admin.add_view(ModelView(Planets, db.session))
-    admin.add_view(ModelView(Characters, db.session))
+    admin.add_view(UsersView(Users, db.session))
+    admin.add_view(CatalogView(Planets, db.session))
+    admin.add_view(CatalogView(Characters, db.session))
     admin.add_view(ModelView(Favorites, db.session))
 
     # You can duplicate that line to add mew models
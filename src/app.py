@@ -2,23 +2,60 @@
 This module takes care of starting the API Server, Loading the DB and Adding the endpoints
 """
 import os
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, get_jwt, decode_token
 import datetime
-from flask import Flask, request, jsonify, url_for
+from urllib.parse import urlencode
+from flask import Flask, Response, g, request, jsonify, url_for, stream_with_context
 from flask_migrate import Migrate
 from flask_swagger import swagger
 from flask_cors import CORS
-from utils import APIException, generate_sitemap
+from werkzeug.middleware.proxy_fix import ProxyFix
+from utils import APIException, generate_sitemap, get_page_limit, keyset_query, keyset_result, get_sort, apply_filters, make_etag, not_modified, with_etag
 from admin import setup_admin
-from models import db, Users,Planets,Favorites,Characters
+from commands import setup_commands
+from bulk import bulk_create, bulk_update, bulk_delete
+from cache import MISSING, DatabaseVersions, VersionedCache, create_backend
+from search import search, SEARCH_TABLES
+from passwords import PasswordVerifier, PasswordVerifierBusy, hash_password
+from tokens import CachingJWTManager, create_blocklist
+from ratelimit import RateLimiter, create_store
+from metrics import REGISTRY
+from profiling import RequestProfiler
+from queryguard import QueryGuard, query_budget
+from pool import engine_options_from_env, register_pool_gauges
+from replicas import ReplicaRouter
+from leaderboard import TopFavorites, track_favorites_counts
+from invalidation import track_changes, favorites_namespace
+from serializers import FastJSONProvider, character_serializer, planet_serializer, user_serializer, dumps
+from sqlalchemy.exc import IntegrityError
+from models import db, Users,Planets,Favorites,Characters, CacheVersions, insert_favorite, bulk_insert_favorites, bulk_delete_favorites, adjust_favorites_counts, resolve_homeworld_ids, link_homeworlds
 
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 
 # La clave super secreta
 app.config['SECRET_KEY'] = 'Sesuponequeestodebesersecretisimo' 
 
-jwt = JWTManager(app)
+# Caché de tokens ya verificados y lista de tokens revocados.
+# TOKEN_BLOCKLIST_BACKEND acepta los mismos valores que CACHE_BACKEND.
+jwt = CachingJWTManager(
+    app,
+    cache_size=int(os.getenv('TOKEN_CACHE_SIZE', 10000)),
+    cache_ttl=int(os.getenv('TOKEN_CACHE_TTL', 300))
+)
+token_blocklist = create_blocklist(
+    os.getenv('TOKEN_BLOCKLIST_BACKEND', os.getenv('CACHE_BACKEND', 'memory'))
+)
+
+# PyJWT exige que el "sub" del token sea un string
+@jwt.user_identity_loader
+def user_identity_lookup(user_id):
+    return str(user_id)
+
+@jwt.token_in_blocklist_loader
+def check_if_token_revoked(jwt_header, jwt_payload):
+    return token_blocklist.is_revoked(jwt_payload['jti'])
 
 
 app.url_map.strict_slashes = False
@@ -29,17 +66,176 @@ if db_url is not None:
 else:
     app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:////tmp/test.db"
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Pool de conexiones: DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options_from_env(app.config['SQLALCHEMY_DATABASE_URI'])
+
+# Verificación de contraseñas: hilos que pueden hashear a la vez (por defecto
+# uno por CPU), peticiones que pueden esperar y segundos máximos de espera
+password_verifier = PasswordVerifier(
+    workers=int(os.getenv('PASSWORD_WORKERS', 0)) or None,
+    queue_size=int(os.getenv('PASSWORD_QUEUE_SIZE')) if os.getenv('PASSWORD_QUEUE_SIZE') else None,
+    timeout=float(os.getenv('PASSWORD_TIMEOUT', 10))
+)
+# Hash de referencia para que un email inexistente tarde lo mismo que uno válido
+DUMMY_PASSWORD_HASH = hash_password(os.urandom(16).hex())
+
+# Tamaño de página por defecto y máximo para los listados
+app.config['PAGE_SIZE_DEFAULT'] = int(os.getenv('PAGE_SIZE_DEFAULT', 50))
+app.config['PAGE_SIZE_MAX'] = int(os.getenv('PAGE_SIZE_MAX', 500))
+# Filas que se leen por lote en las exportaciones NDJSON
+app.config['EXPORT_BATCH_SIZE'] = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+# Máximo de favoritos que se pueden sincronizar en una petición
+app.config['BULK_FAVORITES_MAX'] = int(os.getenv('BULK_FAVORITES_MAX', 1000))
+# Carga masiva del catálogo: filas por transacción y máximo de filas por petición
+app.config['BULK_CHUNK_SIZE'] = int(os.getenv('BULK_CHUNK_SIZE', 500))
+app.config['BULK_MAX_ROWS'] = int(os.getenv('BULK_MAX_ROWS', 10000))
+# Resultados por defecto y máximos de /search
+app.config['SEARCH_LIMIT_DEFAULT'] = int(os.getenv('SEARCH_LIMIT_DEFAULT', 10))
+app.config['SEARCH_LIMIT_MAX'] = int(os.getenv('SEARCH_LIMIT_MAX', 50))
+# Ranking de favoritos: cuántos se guardan en memoria y cada cuánto se recargan
+app.config['FAVORITES_TOP_MAX'] = int(os.getenv('FAVORITES_TOP_MAX', 100))
+app.config['FAVORITES_TOP_TTL'] = int(os.getenv('FAVORITES_TOP_TTL', 30))
+# Caché de personajes y planetas (por ID y listados).
+# CACHE_BACKEND: memory (por worker), file:///tmp/api-cache.db o redis://host:6379/0
+app.config['CACHE_BACKEND'] = os.getenv('CACHE_BACKEND', 'memory')
+app.config['CACHE_MAX_ENTRIES'] = int(os.getenv('CACHE_MAX_ENTRIES', 10000))
+app.config['CACHE_TTL'] = int(os.getenv('CACHE_TTL', 300))
+
+cache_backend = create_backend(
+    app.config['CACHE_BACKEND'], app.config['CACHE_MAX_ENTRIES'], app.config['CACHE_TTL']
+)
+character_cache = VersionedCache(cache_backend, 'characters', app.config['CACHE_TTL'])
+planet_cache = VersionedCache(cache_backend, 'planets', app.config['CACHE_TTL'])
+
+# Versiones de las que depende /users/favorites, leídas una vez por petición:
+# la del usuario, la común a todos (escrituras sin usuario conocido, p. ej.
+# al borrar planetas en bloque) y las del catálogo
+def favorites_versions(user_id):
+    return {
+        'favorites': cache_backend.get_version(favorites_namespace(user_id)),
+        'all_favorites': cache_backend.get_version('favorites'),
+        'characters': character_cache.version(),
+        'planets': planet_cache.version(),
+    }
+
+# Los ETag salen de los contadores de versión. Con el backend en memoria los
+# contadores se guardan en la tabla cache_versions (ver más abajo) para que
+# todos los workers vean los mismos; si no, otro worker respondería 304 con
+# datos ya cambiados y no se emite ETag.
+def versioned_etag(*parts):
+    return make_etag(*parts) if cache_backend.shared_versions else None
+
+top_favorites = {
+    'planets': TopFavorites(Planets, Planets.planet_id, 'planet_id',
+                            app.config['FAVORITES_TOP_MAX'], app.config['FAVORITES_TOP_TTL']),
+    'characters': TopFavorites(Characters, Characters.character_id, 'character_id',
+                               app.config['FAVORITES_TOP_MAX'], app.config['FAVORITES_TOP_TTL']),
+}
+track_favorites_counts(db.session, top_favorites)
+# Cualquier escritura confirmada (API, admin, CLI) invalida la caché afectada
+track_changes(db.session, cache_backend.bump_version)
 
 MIGRATE = Migrate(app, db)
 db.init_app(app)
+with app.app_context():
+    register_pool_gauges(db.engine)
+    if not cache_backend.shared:
+        cache_backend.versions = DatabaseVersions(db.engine, CacheVersions.__table__)
+
+# Réplicas de solo lectura: DATABASE_REPLICA_URLS separadas por comas.
+# Tras una escritura, las lecturas del mismo usuario van al primario durante
+# REPLICA_PIN_SECONDS para que vea sus propios cambios. Esa marca se guarda en
+# la caché, así que tiene que ser compartida: con la de memoria otro worker no
+# la vería y el usuario leería de una réplica con retraso.
+replica_urls = [url.strip().replace("postgres://", "postgresql://")
+                for url in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+app.config['REPLICA_PIN_SECONDS'] = int(os.getenv('REPLICA_PIN_SECONDS', 5))
+if replica_urls and not cache_backend.shared:
+    raise RuntimeError("DATABASE_REPLICA_URLS requires a shared CACHE_BACKEND (file:// or redis://)")
+if replica_urls:
+    app.extensions['replica_router'] = ReplicaRouter(
+        replica_urls,
+        engine_options_from_env(replica_urls[0]),
+        health_interval=float(os.getenv('REPLICA_HEALTH_INTERVAL', 5)),
+        retry_after=float(os.getenv('REPLICA_RETRY_SECONDS', 30))
+    )
 CORS(app)
 setup_admin(app)
 
+# Perfilado opcional (PROFILING_ENABLED=1): histogramas en /metrics, cabecera
+# Server-Timing y volcados de cProfile de las peticiones lentas en PROFILING_DIR
+RequestProfiler(app)
+
+# Presupuesto de consultas por petición para tests y staging (QUERY_GUARD=warn|raise)
+QueryGuard(app)
+
+# Límite de peticiones por usuario (identidad del JWT) o por IP si no hay token.
+# Formato "peticiones/periodo[:ráfaga]"; /token tiene su propio límite, más estricto.
+app.config['RATELIMIT_ENABLED'] = os.getenv('RATELIMIT_ENABLED', '1') == '1'
+rate_limiter = RateLimiter(
+    create_store(os.getenv('RATELIMIT_STORAGE', 'memory')),
+    default=os.getenv('RATELIMIT_DEFAULT', '600/minute:100'),
+    policies={
+        'generate_token': os.getenv('RATELIMIT_TOKEN', '10/minute:5'),
+    }
+)
+
+# Detrás del router de Render/Heroku todas las peticiones llegan desde la IP del
+# proxy: con TRUSTED_PROXY_HOPS=n se toma la IP del cliente de X-Forwarded-For
+# (y el esquema y host de X-Forwarded-Proto/Host) confiando en n proxies.
+# Con 0 (por defecto, sin proxy delante) las cabeceras se ignoran.
+app.config['TRUSTED_PROXY_HOPS'] = int(os.getenv('TRUSTED_PROXY_HOPS', 0))
+if app.config['TRUSTED_PROXY_HOPS']:
+    hops = app.config['TRUSTED_PROXY_HOPS']
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops, x_host=hops)
+
+# Usuario del JWT (o la IP si no hay token) que hace la petición
+def request_client():
+    auth = request.headers.get('Authorization', '')
+    if auth.startswith('Bearer '):
+        try:
+            # decode_token usa la caché de tokens verificados, así que es barato
+            return 'user:' + decode_token(auth[7:])['sub']
+        except Exception:
+            pass
+    return 'ip:' + (request.remote_addr or 'unknown')
+
+@app.before_request
+def apply_rate_limit():
+    if not app.config['RATELIMIT_ENABLED'] or request.endpoint in (None, 'static'):
+        return None
+    retry_after = rate_limiter.hit(request.endpoint, request_client())
+    if retry_after:
+        response = jsonify({"message": "Too many requests, try again later"})
+        response.headers['Retry-After'] = str(retry_after)
+        return response, 429
+    return None
+
+@app.before_request
+def route_reads_to_replicas():
+    g.read_only = False
+    if 'replica_router' not in app.extensions or request.method not in ('GET', 'HEAD'):
+        return None
+    g.read_only = cache_backend.get(f"pin:{request_client()}") is MISSING
+    return None
+
+@app.after_request
+def pin_writes_to_primary(response):
+    if 'replica_router' in app.extensions and request.method not in ('GET', 'HEAD') \
+            and response.status_code < 400:
+        cache_backend.set(f"pin:{request_client()}", 1, app.config['REPLICA_PIN_SECONDS'])
+    return response
+
 # Handle/serialize errors like a JSON object
 @app.errorhandler(APIException)
 def handle_invalid_usage(error):
     return jsonify(error.to_dict()), error.status_code
 
+# [GET] /metrics - Métricas en formato Prometheus (de este worker)
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
 # generate sitemap with all your endpoints
 @app.route('/')
 def sitemap():
@@ -47,6 +243,10 @@ def sitemap():
 
 #### Endpoints ####
 
+# Clave de caché de un listado: todos los parámetros de la URL ordenados
+def list_cache_key(items=None):
+    return 'list?' + urlencode(sorted(request.args.items(multi=True) if items is None else items))
+
 # [POST] /token - Tokenización de usuario
 
 @app.route('/token', methods=['POST'])
@@ -60,7 +260,21 @@ def generate_token():
 
     user = Users.query.filter_by(email=email).first()
 
-    if not user or not user.check_password(password):
+    # El KDF se calcula en el pool acotado; si está saturado se responde 503
+    try:
+        valid = password_verifier.verify(
+            user.password_hash if user else DUMMY_PASSWORD_HASH, password
+        )
+        if user and valid and user.password_needs_rehash():
+            # Actualizar contraseñas en texto plano o con un coste antiguo
+            user.password_hash = password_verifier.hash(password)
+            db.session.commit()
+    except PasswordVerifierBusy:
+        response = jsonify({"message": "Too many login attempts in progress, try again later"})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+
+    if not user or not valid:
         return jsonify({"message": "The user o the password are invalid"}), 401
 
     access_token = create_access_token(
@@ -71,25 +285,219 @@ def generate_token():
     return jsonify({'token': access_token}), 200
 
 
-# [GET] /characters - Obtener todos los personajes
+# [POST] /logout - Revocar el token actual
+
+@app.route('/logout', methods=['POST'])
+@jwt_required()
+def revoke_token():
+    token = get_jwt()
+    token_blocklist.revoke(token['jti'], token['exp'])
+
+    return jsonify({"message": "Token revoked"}), 200
+
+
+# Filtros y ordenaciones permitidos en los listados (todos tienen índice)
+CHARACTER_FILTERS = {
+    'species': Characters.species,
+    'homeworld': Characters.homeworld,
+    'gender': Characters.gender,
+}
+CHARACTER_SORTS = {
+    'character_id': Characters.character_id,
+    'name': Characters.name,
+}
+PLANET_FILTERS = {
+    'climate': Planets.climate,
+    'terrain': Planets.terrain,
+}
+PLANET_RANGES = {
+    'population': Planets.population,
+}
+PLANET_SORTS = {
+    'planet_id': Planets.planet_id,
+    'name': Planets.name,
+    'population': Planets.population,
+}
+
+CATALOG = {
+    'characters': {
+        'serializer': character_serializer,
+        'key': Characters.character_id,
+        'cache': character_cache,
+        'not_found': "Character not found",
+        'filters': CHARACTER_FILTERS,
+        'ranges': {},
+        'sorts': CHARACTER_SORTS,
+    },
+    'planets': {
+        'serializer': planet_serializer,
+        'key': Planets.planet_id,
+        'cache': planet_cache,
+        'not_found': "Planet not found",
+        'filters': PLANET_FILTERS,
+        'ranges': PLANET_RANGES,
+        'sorts': PLANET_SORTS,
+    },
+}
+
+# ?expand=nombre: registros relacionados que se incluyen completos en la respuesta.
+# nombre -> (recurso relacionado, clave foránea, campo de salida)
+EXPANSIONS = {
+    'characters': {
+        'homeworld': ('planets', Characters.homeworld_id, 'homeworld_planet'),
+    },
+    'planets': {},
+}
+
+def get_expand(resource, args):
+    raw = args.get('expand')
+    if not raw:
+        return ()
+    names = tuple(dict.fromkeys(name.strip() for name in raw.split(',') if name.strip()))
+    unknown = [name for name in names if name not in EXPANSIONS[resource]]
+    if unknown:
+        raise APIException(
+            "Unknown expand: " + ", ".join(unknown), status_code=400,
+            payload={'allowed_expand': list(EXPANSIONS[resource])}
+        )
+    return names
+
+# Las páginas con expand dependen también de la versión de los recursos expandidos
+def catalog_cache_key(resource, args, cache_key):
+    for name in get_expand(resource, args):
+        related = EXPANSIONS[resource][name][0]
+        cache_key += f"#{related}={CATALOG[related]['cache'].version()}"
+    return cache_key
+
+# Sentencia para leer un registro completo por ID (se usa al fallar la caché)
+def catalog_item_query(resource, item_id):
+    spec = CATALOG[resource]
+    serializer = spec['serializer']
+    return db.select(*serializer.columns_for(serializer.fields)).where(spec['key'] == item_id)
+
+# Registro completo ya serializado (o None si no existe), desde la caché
+def catalog_item(resource, item_id):
+    spec = CATALOG[resource]
+    version = spec['cache'].version()
+    data = spec['cache'].get(item_id, version)
+    if data is MISSING:
+        row = db.session.execute(catalog_item_query(resource, item_id)).first()
+        data = None if row is None else spec['serializer'].one(row)
+        spec['cache'].set(item_id, data, version)
+    return data
+
+# Varios registros completos por ID: los que no están en la caché se leen con
+# una sola consulta IN. Devuelve {id: datos o None si no existe}.
+def catalog_items(resource, ids, version):
+    items, missing = cached_catalog_items(resource, ids, version)
+    if missing:
+        rows = db.session.execute(catalog_items_query(resource, missing)).all()
+        store_catalog_items(resource, items, missing, rows, version)
+    return items
+
+# Separa los IDs en los que ya están en la caché y los que hay que consultar
+def cached_catalog_items(resource, ids, version):
+    cache = CATALOG[resource]['cache']
+    items = {}
+    missing = []
+    for item_id in dict.fromkeys(ids):
+        data = cache.get(item_id, version)
+        if data is MISSING:
+            missing.append(item_id)
+        else:
+            items[item_id] = data
+    return items, missing
+
+# Añade a `items` las filas leídas y guarda en la caché (también los que no existen)
+def store_catalog_items(resource, items, missing, rows, version):
+    spec = CATALOG[resource]
+    for row in rows:
+        data = spec['serializer'].one(row)
+        items[data[spec['key'].key]] = data
+    for item_id in missing:
+        spec['cache'].set(item_id, items.setdefault(item_id, None), version)
+
+def catalog_items_query(resource, ids):
+    spec = CATALOG[resource]
+    serializer = spec['serializer']
+    return db.select(*serializer.columns_for(serializer.fields)).where(spec['key'].in_(ids))
+
+# Consulta de una página del catálogo a partir de los parámetros de la URL.
+# Devuelve la sentencia y una función que convierte sus filas en la respuesta;
+# se comparte con los handlers async de asgi.py. Los recursos de ?expand= se
+# leen en la misma consulta con un LEFT JOIN por relación.
+def catalog_page_query(resource, args, *conditions):
+    spec = CATALOG[resource]
+    serializer, key = spec['serializer'], spec['key']
+    fields = serializer.requested_fields(args)
+    expand = get_expand(resource, args)
+    limit = get_page_limit(app.config['PAGE_SIZE_DEFAULT'], app.config['PAGE_SIZE_MAX'], args)
+    sort_column, descending = get_sort(spec['sorts'], args)
+    # Solo se leen las columnas pedidas, como tuplas y no como objetos ORM
+    statement = db.select(*serializer.columns_for(
+        fields, key.key, *([sort_column.key] if sort_column is not None else [])
+    )).where(*conditions)
+    # Las columnas expandidas van detrás, con un alias para no chocar con las propias
+    for name in expand:
+        related, foreign_key, output = EXPANSIONS[resource][name]
+        related_spec = CATALOG[related]
+        related_table = db.aliased(related_spec['serializer'].model)
+        statement = statement.add_columns(*[
+            getattr(related_table, field).label(f"{output}__{field}")
+            for field in related_spec['serializer'].fields
+        ]).outerjoin(related_table, foreign_key == getattr(related_table, related_spec['key'].key))
+    statement = apply_filters(statement, spec['filters'], spec['ranges'], args)
+    statement = keyset_query(statement, key, limit, args.get('after'), sort_column, descending)
+
+    def build_page(rows):
+        rows, next_cursor = keyset_result(rows, limit, key, sort_column)
+        results = serializer.many(rows, fields)
+        for name in expand:
+            related, _, output = EXPANSIONS[resource][name]
+            related_spec = CATALOG[related]
+            related_fields = related_spec['serializer'].fields
+            related_key = related_spec['key'].key
+            for result, row in zip(results, rows):
+                values = row._mapping
+                if values[f"{output}__{related_key}"] is None:
+                    result[output] = None
+                else:
+                    result[output] = {field: values[f"{output}__{field}"] for field in related_fields}
+        return {'results': results, 'next_cursor': next_cursor}
+
+    return statement, build_page
+
+# Recursos de ?expand= de un registro ya serializado (leídos desde su caché)
+def catalog_expansions(resource, data, args):
+    expanded = {}
+    for name in get_expand(resource, args):
+        related, foreign_key, output = EXPANSIONS[resource][name]
+        related_id = data[foreign_key.key]
+        expanded[output] = None if related_id is None else catalog_item(related, related_id)
+    return expanded
+
+# [GET] /characters?limit=&after=&species=&homeworld=&gender=&sort= - Obtener los personajes paginados por cursor
 @app.route('/characters', methods=['GET'])
 @jwt_required()
 def get_all_characters():
     # Accede al usuario autenticado
     current_user_id = get_jwt_identity()
 
-    characters = Characters.query.all()
-    characters_list = []
-    for character in characters:
-        characters_list.append({
-            'character_id': character.character_id,
-            'name': character.name,
-            'species': character.species,
-            'homeworld': character.homeworld,
-            'gender': character.gender
-        })
+    version = character_cache.version()
+    cache_key = catalog_cache_key('characters', request.args, list_cache_key())
+    # Si el cliente ya tiene esta versión no se consulta ni se serializa nada
+    etag = versioned_etag('characters', version, cache_key)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    page = character_cache.get(cache_key, version)
+    if page is MISSING:
+        statement, build_page = catalog_page_query('characters', request.args)
+        page = build_page(db.session.execute(statement).all())
+        character_cache.set(cache_key, page, version)
     
-    return jsonify(characters_list), 200
+    return with_etag(jsonify(page), etag), 200
 
 # [GET] /character/<int:character_id> - Obtener la información de un personaje por ID
 @app.route('/character/<int:character_id>', methods=['GET'])
@@ -97,20 +505,17 @@ def get_all_characters():
 def get_character(character_id):
     current_user_id = get_jwt_identity()
 
-    character = Characters.query.filter_by(character_id=character_id).first()
-    
-    if character is None:
-        return jsonify({"message": "Character not found"}), 404
+    fields = character_serializer.requested_fields()
 
-    character_data = {
-        'character_id': character.character_id,
-        'name': character.name,
-        'species': character.species,
-        'homeworld': character.homeworld,
-        'gender': character.gender
-    }
+    # Primero se busca en la caché (también recuerda los IDs que no existen)
+    character_data = catalog_item('characters', character_id)
+    if character_data is None:
+        return jsonify({"message": "Character not found"}), 404
 
-    return jsonify(character_data), 200
+    return jsonify(dict(
+        character_serializer.project(character_data, fields),
+        **catalog_expansions('characters', character_data, request.args)
+    )), 200
 
 # [POST] /character - Agregar un personaje
 @app.route('/character', methods=['POST'])
@@ -131,6 +536,8 @@ def add_character():
     )
 
     db.session.add(new_character)
+    db.session.flush()
+    resolve_homeworld_ids(Characters.character_id == new_character.character_id)
     db.session.commit()
 
     return jsonify({
@@ -156,6 +563,9 @@ def update_character(character_id):
     character.species = data.get('species', character.species)
     character.homeworld = data.get('homeworld', character.homeworld)
     character.gender = data.get('gender', character.gender)
+    if 'homeworld' in data:
+        db.session.flush()
+        resolve_homeworld_ids(Characters.character_id == character_id)
 
     db.session.commit()
 
@@ -188,26 +598,27 @@ def delete_character(character_id):
 
 #### Planets ####
 
-# [GET] /planets - Obtener todos los planetas
+# [GET] /planets?limit=&after=&climate=&terrain=&population_min=&population_max=&sort= - Obtener los planetas paginados por cursor
 
 @app.route('/planets', methods=['GET'])
 @jwt_required()
 def get_all_planets():
     current_user_id = get_jwt_identity()
 
-    planets = Planets.query.all()
-    
-    planets_list = []
-    for planet in planets:
-        planets_list.append({
-            'planet_id': planet.planet_id,
-            'name': planet.name,
-            'climate': planet.climate,
-            'terrain': planet.terrain,
-            'population': planet.population
-        })
+    version = planet_cache.version()
+    cache_key = catalog_cache_key('planets', request.args, list_cache_key())
+    etag = versioned_etag('planets', version, cache_key)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    page = planet_cache.get(cache_key, version)
+    if page is MISSING:
+        statement, build_page = catalog_page_query('planets', request.args)
+        page = build_page(db.session.execute(statement).all())
+        planet_cache.set(cache_key, page, version)
     
-    return jsonify(planets_list), 200
+    return with_etag(jsonify(page), etag), 200
 
 
 # [GET] /planet/<int:planet_id> - Obtener la información de un planeta por ID
@@ -217,20 +628,41 @@ def get_all_planets():
 def get_planet(planet_id):
     current_user_id = get_jwt_identity()
 
-    planet = Planets.query.filter_by(planet_id=planet_id).first()
-    
-    if planet is None:
+    fields = planet_serializer.requested_fields()
+
+    planet_data = catalog_item('planets', planet_id)
+    if planet_data is None:
         return jsonify({"message": "Planet not found"}), 404
 
-    planet_data = {
-        'planet_id': planet.planet_id,
-        'name': planet.name,
-        'climate': planet.climate,
-        'terrain': planet.terrain,
-        'population': planet.population
-    }
+    return jsonify(planet_serializer.project(planet_data, fields)), 200
+
+# [GET] /planet/<int:planet_id>/residents?limit=&after=&fields=&sort=&expand= - Personajes de un planeta
+
+@app.route('/planet/<int:planet_id>/residents', methods=['GET'])
+@jwt_required()
+def get_planet_residents(planet_id):
+    current_user_id = get_jwt_identity()
 
-    return jsonify(planet_data), 200
+    version = character_cache.version()
+    cache_key = catalog_cache_key('characters', request.args, f"residents:{planet_id}:{list_cache_key()}")
+    etag = versioned_etag('residents', version, planet_cache.version(), cache_key)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    if catalog_item('planets', planet_id) is None:
+        return jsonify({"message": "Planet not found"}), 404
+
+    # Misma paginación y filtros que /characters, por el índice de homeworld_id
+    page = character_cache.get(cache_key, version)
+    if page is MISSING:
+        statement, build_page = catalog_page_query(
+            'characters', request.args, Characters.homeworld_id == planet_id
+        )
+        page = build_page(db.session.execute(statement).all())
+        character_cache.set(cache_key, page, version)
+
+    return with_etag(jsonify(page), etag), 200
 
 # [POST] /planet - Agregar un planeta
 
@@ -252,6 +684,9 @@ def add_planet():
     )
 
     db.session.add(new_planet)
+    db.session.flush()
+    # Personajes que ya tenían este planeta como homeworld pero sin enlazar
+    link_homeworlds([new_planet.name])
     db.session.commit()
 
     return jsonify({
@@ -278,6 +713,9 @@ def update_planet(planet_id):
     planet.climate = data.get('climate', planet.climate)
     planet.terrain = data.get('terrain', planet.terrain)
     planet.population = data.get('population', planet.population)
+    if 'name' in data:
+        db.session.flush()
+        link_homeworlds([planet.name])
 
     db.session.commit()
 
@@ -300,6 +738,7 @@ def delete_planet(planet_id):
     if not planet:
         return jsonify({"error": "Planet not found"}), 404
 
+    # Los personajes de este planeta quedan con homeworld_id NULL (ON DELETE SET NULL)
     db.session.delete(planet)
     db.session.commit()
 
@@ -311,6 +750,75 @@ def delete_planet(planet_id):
 
 #### Fin Planets ####
 
+#### Bulk Characters / Planets ####
+
+def get_bulk_rows(key):
+    data = request.get_json(silent=True)
+    rows = data.get(key) if isinstance(data, dict) else data
+    if not isinstance(rows, list):
+        raise APIException(f"Expected a list or an object with a '{key}' list", status_code=400)
+    if len(rows) > app.config['BULK_MAX_ROWS']:
+        raise APIException(f"At most {app.config['BULK_MAX_ROWS']} rows per request", status_code=400)
+    return rows
+
+def get_chunk_size():
+    chunk_size = request.args.get('chunk_size', app.config['BULK_CHUNK_SIZE'], type=int)
+    return max(1, min(chunk_size, app.config['BULK_CHUNK_SIZE']))
+
+# [POST] /characters/bulk, /planets/bulk - Crear muchos registros en una petición
+
+@app.route('/<any(characters, planets):resource>/bulk', methods=['POST'])
+@jwt_required()
+@query_budget(max_statements=None, max_repeats=None)
+def bulk_create_resource(resource):
+    current_user_id = get_jwt_identity()
+
+    results = bulk_create(resource, get_bulk_rows('items'), get_chunk_size())
+    return jsonify({'results': results}), 200
+
+# [PATCH] /characters/bulk, /planets/bulk - Modificar muchos registros (cada fila lleva su "id")
+
+@app.route('/<any(characters, planets):resource>/bulk', methods=['PATCH'])
+@jwt_required()
+@query_budget(max_statements=None, max_repeats=None)
+def bulk_update_resource(resource):
+    current_user_id = get_jwt_identity()
+
+    results = bulk_update(resource, get_bulk_rows('items'), get_chunk_size())
+    return jsonify({'results': results}), 200
+
+# [DELETE] /characters/bulk, /planets/bulk - Eliminar muchos registros por ID
+
+@app.route('/<any(characters, planets):resource>/bulk', methods=['DELETE'])
+@jwt_required()
+@query_budget(max_statements=None, max_repeats=None)
+def bulk_delete_resource(resource):
+    current_user_id = get_jwt_identity()
+
+    results = bulk_delete(resource, get_bulk_rows('ids'), get_chunk_size())
+    return jsonify({'results': results}), 200
+
+#### Fin Bulk ####
+
+# flask import-catalog: carga masiva desde ficheros JSON, NDJSON o CSV
+setup_commands(app)
+
+# [GET] /cache/stats - Estadísticas de la caché (los contadores son de este worker)
+
+@app.route('/cache/stats', methods=['GET'])
+@jwt_required()
+def get_cache_stats():
+    current_user_id = get_jwt_identity()
+
+    return jsonify(dict(
+        cache_backend.stats(),
+        tokens=jwt.token_cache.stats(),
+        versions={
+            'characters': character_cache.version(),
+            'planets': planet_cache.version()
+        }
+    )), 200
+
 #### Users ####
 
 # [GET] /users - Listar todos los usuarios
@@ -320,47 +828,107 @@ def delete_planet(planet_id):
 def get_all_users():
     current_user_id = get_jwt_identity()
 
-    users = Users.query.filter_by().all() 
-
-    users_data = [{
-        'user_id': user.user_id,
-        'email': user.email,
-        'username': user.username,
-        'user_creation_date': user.user_creation_date
-    } for user in users]
-
-    return jsonify(users_data), 200
+    fields = user_serializer.requested_fields()
+    users = db.session.execute(db.select(*user_serializer.columns_for(fields))).all()
+
+    return jsonify(user_serializer.many(users, fields)), 200
+
+# La respuesta depende de los favoritos del usuario y de los datos del catálogo
+def favorites_etag(user_id, versions, include=()):
+    return versioned_etag('favorites', user_id, *versions.values(), *include)
+
+# ?include=planets,characters: registros completos dentro de cada favorito.
+# recurso -> (favorite_type, clave, campo de salida)
+FAVORITE_INCLUDES = {
+    'planets': ('Planet', 'planet_id', 'planet'),
+    'characters': ('Character', 'character_id', 'character'),
+}
+
+def get_include(args):
+    raw = args.get('include')
+    if not raw:
+        return ()
+    include = tuple(sorted(set(name.strip() for name in raw.split(',') if name.strip())))
+    unknown = [name for name in include if name not in FAVORITE_INCLUDES]
+    if unknown:
+        raise APIException(
+            "Unknown include: " + ", ".join(unknown), status_code=400,
+            payload={'allowed_include': list(FAVORITE_INCLUDES)}
+        )
+    return include
+
+# IDs de cada tipo incluido que aparecen en los favoritos
+def favorite_include_ids(favorites_data, include):
+    ids = {}
+    for resource in include:
+        favorite_type, key, _ = FAVORITE_INCLUDES[resource]
+        ids[resource] = [favorite[key] for favorite in favorites_data
+                         if favorite['favorite_type'] == favorite_type]
+    return ids
+
+# records = {recurso: {id: datos}} ya cargados por lotes (catalog_items)
+def attach_includes(favorites_data, records):
+    for resource, items in records.items():
+        favorite_type, key, output = FAVORITE_INCLUDES[resource]
+        for favorite in favorites_data:
+            if favorite['favorite_type'] == favorite_type:
+                favorite[output] = items.get(favorite[key])
+    return favorites_data
+
+# Favoritos del usuario con el nombre del planeta o personaje en una sola
+# consulta (sin una consulta extra por favorito).
+def favorites_query(user_id):
+    return (
+        db.select(
+            Favorites.planet_id, Planets.name,
+            Favorites.character_id, Characters.name
+        )
+        .outerjoin(Planets, Favorites.planet_id == Planets.planet_id)
+        .outerjoin(Characters, Favorites.character_id == Characters.character_id)
+        .filter(Favorites.user_id == user_id)
+        .order_by(Favorites.favorite_id)
+    )
 
-# [GET] /users/favorites - Listar todos los favoritos del usuario actual
+def serialize_favorites(rows):
+    favorites_data = []
+    for planet_id, planet_name, character_id, character_name in rows:
+        if planet_id is not None:
+            favorites_data.append({
+                'favorite_type': 'Planet',
+                'planet_id': planet_id,
+                'name': planet_name
+            })
+        elif character_id is not None:
+            favorites_data.append({
+                'favorite_type': 'Character',
+                'character_id': character_id,
+                'name': character_name
+            })
+    return favorites_data
+
+# [GET] /users/favorites?include=planets,characters - Listar todos los favoritos del usuario actual
 
 @app.route('/users/favorites', methods=['GET'])
 @jwt_required()
 def get_user_favorites():
     current_user_id = get_jwt_identity()
 
-    # Obtener los favoritos del usuario actual.
-    favorites = Favorites.query.filter_by(user_id=current_user_id).all()
-    favorites_data = []
+    include = get_include(request.args)
+    versions = favorites_versions(current_user_id)
+    etag = favorites_etag(current_user_id, versions, include)
+    cached = not_modified(etag)
+    if cached:
+        return cached
 
-    for favorite in favorites:
-        if favorite.favorite_type == 'Planet':
-            planet = Planets.query.get(favorite.item_id)
-            if planet:
-                favorites_data.append({
-                    'favorite_type': favorite.favorite_type,
-                    'planet_id': planet.planet_id,
-                    'name': planet.name
-                })
-        elif favorite.favorite_type == 'Character':
-            character = Characters.query.get(favorite.item_id)
-            if character:
-                favorites_data.append({
-                    'favorite_type': favorite.favorite_type,
-                    'character_id': character.character_id,
-                    'name': character.name
-                })
-    
-    return jsonify(favorites_data), 200
+    favorites = db.session.execute(favorites_query(current_user_id)).all()
+    favorites_data = serialize_favorites(favorites)
+    # Como mucho una consulta IN por tipo (y ninguna si están en la caché)
+    attach_includes(favorites_data, {
+        resource: catalog_items(resource, ids, versions[resource])
+        for resource, ids in favorite_include_ids(favorites_data, include).items()
+    })
+
+    return with_etag(jsonify(favorites_data), etag), 200
 
 # [POST] /favorite/planet/<int:planet_id> - Agregar un nuevo planeta favorito
 
@@ -368,36 +936,25 @@ def get_user_favorites():
 @jwt_required()
 def add_favorite_planet(planet_id):
     current_user_id = get_jwt_identity()  # Obtiene el user_id del JWT
-    
-    # Verificar si el planeta existe.
-    planet = Planets.query.get(planet_id)
-    if not planet:
+
+    # Un solo INSERT ... ON CONFLICT DO NOTHING: la FK comprueba que el planeta
+    # exista y el índice único evita duplicados, sin consultas previas.
+    try:
+        inserted = insert_favorite(current_user_id, planet_id=planet_id)
+    except IntegrityError:
+        db.session.rollback()
         return jsonify({"error": "Planet not found"}), 404
 
-    # Verificar si ya es favorito
-    existing_favorite = Favorites.query.filter_by(
-        user_id=current_user_id,
-        item_id=planet_id,
-        favorite_type="Planet"
-    ).first()
-    
-    if existing_favorite:
+    if inserted is None:
+        db.session.rollback()
         return jsonify({"message": "Planet is already in favorites"}), 400
 
-    # Crear el registro de favorito.
-    new_favorite = Favorites(
-        user_id=current_user_id,
-        item_id=planet_id,
-        favorite_type="Planet"
-    )
-
-    db.session.add(new_favorite)
     db.session.commit()
 
     return jsonify({
         "message": "Planet added to favorites",
         "planet_id": planet_id,
-        "planet_name": planet.name
+        "planet_name": inserted.name
     }), 201
 
 
@@ -407,36 +964,23 @@ def add_favorite_planet(planet_id):
 @jwt_required()
 def add_favorite_character(character_id):
     current_user_id = get_jwt_identity()  # Obtiene el user_id del JWT
-    
-    # Verificar si el personaje existe.
-    character = Characters.query.get(character_id)
-    if not character:
+
+    try:
+        inserted = insert_favorite(current_user_id, character_id=character_id)
+    except IntegrityError:
+        db.session.rollback()
         return jsonify({"error": "Character not found"}), 404
 
-    # Verificar si ya es favorito
-    existing_favorite = Favorites.query.filter_by(
-        user_id=current_user_id,
-        item_id=character_id,
-        favorite_type="Character"
-    ).first()
-    
-    if existing_favorite:
+    if inserted is None:
+        db.session.rollback()
         return jsonify({"message": "Character is already in favorites"}), 400
 
-    # Crear el registro de favorito.
-    new_favorite = Favorites(
-        user_id=current_user_id,
-        item_id=character_id,
-        favorite_type="Character"
-    )
-
-    db.session.add(new_favorite)
     db.session.commit()
 
     return jsonify({
         "message": "Character added to favorites",
         "character_id": character_id,
-        "character_name": character.name
+        "character_name": inserted.name
     }), 201
 
 # [DELETE] /favorite/planet/<int:planet_id> - Eliminar un planeta favorito
@@ -446,17 +990,18 @@ def add_favorite_character(character_id):
 def delete_favorite_planet(planet_id):
     current_user_id = get_jwt_identity()  # Obtiene el user_id del JWT
 
-    # Buscar el favorito correspondiente.
-    favorite = Favorites.query.filter_by(
-        user_id=current_user_id,
-        item_id=planet_id,
-        favorite_type="Planet"
-    ).first()
+    # Borrar el favorito directamente, sin cargarlo antes.
+    result = db.session.execute(
+        db.delete(Favorites)
+        .where(Favorites.user_id == current_user_id, Favorites.planet_id == planet_id)
+        .execution_options(synchronize_session=False, invalidates=(favorites_namespace(current_user_id),))
+    )
 
-    if not favorite:
+    if result.rowcount == 0:
+        db.session.rollback()
         return jsonify({"error": "Favorite not found"}), 404
 
-    db.session.delete(favorite)
+    adjust_favorites_counts([(planet_id, None)], -1)
     db.session.commit()
 
     return jsonify({"message": "Favorite planet removed"}), 200
@@ -469,24 +1014,181 @@ def delete_favorite_planet(planet_id):
 def delete_favorite_character(character_id):
     current_user_id = get_jwt_identity()  
 
-    # Buscar el favorito correspondiente.
-    favorite = Favorites.query.filter_by(
-        user_id=current_user_id,
-        item_id=character_id,
-        favorite_type="Character"
-    ).first()
+    result = db.session.execute(
+        db.delete(Favorites)
+        .where(Favorites.user_id == current_user_id, Favorites.character_id == character_id)
+        .execution_options(synchronize_session=False, invalidates=(favorites_namespace(current_user_id),))
+    )
 
-    if not favorite:
+    if result.rowcount == 0:
+        db.session.rollback()
         return jsonify({"error": "Favorite not found"}), 404
 
-    db.session.delete(favorite)
+    adjust_favorites_counts([(None, character_id)], -1)
     db.session.commit()
 
     return jsonify({"message": "Favorite character removed"}), 200
 
 
+# Lee {"planets": [...], "characters": [...]} y devuelve las listas de IDs sin repetir
+def parse_favorite_ids(data):
+    data = data or {}
+    if not isinstance(data, dict):
+        raise APIException("add and remove must be objects", status_code=400)
+    ids = {}
+    for key in ('planets', 'characters'):
+        values = data.get(key, [])
+        if not isinstance(values, list) or not all(
+            isinstance(value, int) and not isinstance(value, bool) for value in values
+        ):
+            raise APIException(f"{key} must be a list of integer IDs", status_code=400)
+        ids[key] = list(dict.fromkeys(values))
+    return ids
+
+# [POST] /favorites/bulk - Agregar y eliminar varios favoritos en una sola petición
+# Body: {"add": {"planets": [1, 2], "characters": [3]}, "remove": {"planets": [4]}}
+
+@app.route('/favorites/bulk', methods=['POST'])
+@jwt_required()
+@query_budget(max_statements=None, max_repeats=None)
+def bulk_favorites():
+    current_user_id = get_jwt_identity()
+
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        raise APIException("Expected an object with 'add' and/or 'remove'", status_code=400)
+    to_add = parse_favorite_ids(data.get('add'))
+    to_remove = parse_favorite_ids(data.get('remove'))
+
+    total = sum(len(ids) for ids in (*to_add.values(), *to_remove.values()))
+    if total > app.config['BULK_FAVORITES_MAX']:
+        return jsonify({"error": f"At most {app.config['BULK_FAVORITES_MAX']} items per request"}), 400
+    for key in ('planets', 'characters'):
+        if set(to_add[key]) & set(to_remove[key]):
+            return jsonify({"error": f"The same {key} ID cannot be added and removed"}), 400
+
+    # Validar que existan con una sola consulta IN por tipo
+    existing_planets = set(db.session.scalars(
+        db.select(Planets.planet_id).where(Planets.planet_id.in_(to_add['planets']))
+    )) if to_add['planets'] else set()
+    existing_characters = set(db.session.scalars(
+        db.select(Characters.character_id).where(Characters.character_id.in_(to_add['characters']))
+    )) if to_add['characters'] else set()
+
+    # Un INSERT multi-fila y un DELETE en la misma transacción
+    added = bulk_insert_favorites(
+        current_user_id,
+        [planet_id for planet_id in to_add['planets'] if planet_id in existing_planets],
+        [character_id for character_id in to_add['characters'] if character_id in existing_characters]
+    )
+    removed = bulk_delete_favorites(current_user_id, to_remove['planets'], to_remove['characters'])
+    db.session.commit()
+
+    results = []
+    for planet_id in to_add['planets']:
+        if planet_id not in existing_planets:
+            status = 'not_found'
+        elif (planet_id, None) in added:
+            status = 'added'
+        else:
+            status = 'already_in_favorites'
+        results.append({'type': 'planet', 'id': planet_id, 'action': 'add', 'status': status})
+    for character_id in to_add['characters']:
+        if character_id not in existing_characters:
+            status = 'not_found'
+        elif (None, character_id) in added:
+            status = 'added'
+        else:
+            status = 'already_in_favorites'
+        results.append({'type': 'character', 'id': character_id, 'action': 'add', 'status': status})
+    for planet_id in to_remove['planets']:
+        status = 'removed' if (planet_id, None) in removed else 'not_in_favorites'
+        results.append({'type': 'planet', 'id': planet_id, 'action': 'remove', 'status': status})
+    for character_id in to_remove['characters']:
+        status = 'removed' if (None, character_id) in removed else 'not_in_favorites'
+        results.append({'type': 'character', 'id': character_id, 'action': 'remove', 'status': status})
+
+    return jsonify({'results': results}), 200
+
+
+# [GET] /favorites/top?type=planets|characters&limit= - Los más guardados en favoritos
+@app.route('/favorites/top', methods=['GET'])
+@jwt_required()
+def get_top_favorites():
+    current_user_id = get_jwt_identity()
+
+    kinds = request.args.getlist('type') or list(top_favorites)
+    unknown = set(kinds) - set(top_favorites)
+    if unknown:
+        return jsonify({"error": "type must be planets or characters"}), 400
+    limit = get_page_limit(10, app.config['FAVORITES_TOP_MAX'])
+
+    # El ranking ya está ordenado en memoria: cada lectura solo copia `limit` elementos
+    return jsonify({kind: top_favorites[kind].top(limit) for kind in kinds}), 200
+
+
 #### Fin Users  ####
 
+#### Search ####
+
+# [GET] /search?q=&type=characters|planets&limit= - Buscar por prefijo del nombre
+
+@app.route('/search', methods=['GET'])
+@jwt_required()
+def search_catalog():
+    current_user_id = get_jwt_identity()
+
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "q is required"}), 400
+
+    resource = request.args.get('type')
+    if resource is not None and resource not in SEARCH_TABLES:
+        return jsonify({"error": "type must be characters or planets"}), 400
+
+    limit = get_page_limit(app.config['SEARCH_LIMIT_DEFAULT'], app.config['SEARCH_LIMIT_MAX'])
+    resources = [resource] if resource else list(SEARCH_TABLES)
+
+    return jsonify({name: search(name, query, limit) for name in resources}), 200
+
+#### Fin Search ####
+
+#### Export ####
+
+# Serializadores de los recursos exportables (nunca se exporta el password_hash)
+EXPORT_SERIALIZERS = {
+    'characters': character_serializer,
+    'planets': planet_serializer,
+    'users': user_serializer,
+}
+
+# [GET] /export/<resource> - Exportar una tabla completa como NDJSON en streaming
+
+@app.route('/export/<resource>', methods=['GET'])
+@jwt_required()
+def export_resource(resource):
+    current_user_id = get_jwt_identity()
+
+    serializer = EXPORT_SERIALIZERS.get(resource)
+    if serializer is None:
+        return jsonify({"error": "Resource not found"}), 404
+
+    keys = serializer.requested_fields()
+    key_column = serializer.columns[serializer.fields[0]]
+    # yield_per usa un cursor del lado del servidor y lee por lotes,
+    # así la memoria del worker no crece con el tamaño de la tabla
+    statement = db.select(*serializer.columns_for(keys)).order_by(key_column).execution_options(
+        yield_per=app.config['EXPORT_BATCH_SIZE']
+    )
+
+    def generate():
+        for row in db.session.execute(statement):
+            yield dumps(serializer.one(row, keys), default=str) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+#### Fin Export ####
+
 
 
 # this only runs if `$ python src/app.py` is executed
@@ -0,0 +1,272 @@
+"""
+ASGI entry point. The hot read endpoints (catalog listings and details and the
+user's favorites) are served by async handlers on an async SQLAlchemy engine,
+so a worker keeps serving requests while it waits on the database. Every other
+route goes to the Flask app through a WSGI adapter, with the same behavior,
+on a pool of WSGI_THREADS threads (10 by default) so slow Flask requests do not
+queue behind each other. Calls to shared cache, rate-limit and blocklist
+backends (SQLite or Redis) run in the thread pool so they do not block the
+event loop.
+
+The async handlers do not run Flask's before_request/after_request hooks:
+their reads always go to the primary (no replica routing), and they are not
+covered by the profiler (/metrics, Server-Timing) or the query guard.
+
+    gunicorn asgi:application -k uvicorn.workers.UvicornWorker --chdir ./src/
+"""
+import contextlib
+import os
+import jwt as pyjwt
+from a2wsgi import WSGIMiddleware
+from flask_jwt_extended import decode_token
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+from werkzeug.datastructures import MultiDict
+from werkzeug.http import parse_etags
+from app import (
+    app as flask_app, token_blocklist, versioned_etag, rate_limiter, cache_backend, character_cache, planet_cache,
+    CATALOG, EXPANSIONS, get_expand, catalog_cache_key, catalog_item_query, catalog_page_query,
+    cached_catalog_items, catalog_items_query, store_catalog_items, list_cache_key,
+    favorites_versions, favorites_etag, favorites_query, serialize_favorites, get_include, favorite_include_ids, attach_includes
+)
+from cache import MISSING
+from ratelimit import MemoryRateLimitStore
+from tokens import MemoryBlocklist
+from pool import engine_options_from_env
+from utils import APIException
+
+# Drivers async equivalentes a los síncronos; con otra base de datos todo va por Flask
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+
+def async_database_uri(database_uri):
+    dialect, _, rest = database_uri.partition('://')
+    driver = ASYNC_DRIVERS.get(dialect.split('+')[0])
+    return None if driver is None else f"{driver}://{rest}"
+
+
+def async_engine_options(database_uri):
+    # Mismos ajustes del pool que la app Flask, con la versión async del QueuePool
+    options = engine_options_from_env(database_uri)
+    if 'poolclass' in options:
+        options['poolclass'] = AsyncAdaptedQueuePool
+    return options
+
+
+# Los backends en memoria responden sin esperar a nada y se llaman directamente;
+# los compartidos hacen E/S (SQLite o Redis) y van al pool de hilos, igual que
+# la caché en memoria cuando sus versiones están en la base de datos
+CACHE_BLOCKS = cache_backend.shared_versions
+RATELIMIT_BLOCKS = not isinstance(rate_limiter.store, MemoryRateLimitStore)
+BLOCKLIST_BLOCKS = not isinstance(token_blocklist, MemoryBlocklist)
+
+
+async def off_loop(blocks, func, *args):
+    if blocks:
+        return await run_in_threadpool(func, *args)
+    return func(*args)
+
+
+class APIError(Exception):
+    # Errores con el mismo cuerpo que devuelve flask-jwt-extended ({"msg": ...})
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def json_response(data, status_code=200, headers=None):
+    return Response(flask_app.json.dumps(data), status_code, headers,
+                    media_type='application/json')
+
+
+def request_args(request):
+    return MultiDict(request.query_params.multi_items())
+
+
+# Mismo control que @jwt_required(), sin pasar por el contexto de petición de Flask
+async def current_user_id(request):
+    auth = request.headers.get('Authorization')
+    if not auth:
+        raise APIError("Missing Authorization Header", 401)
+    parts = auth.split()
+    if len(parts) != 2 or parts[0] != 'Bearer':
+        raise APIError("Bad Authorization header. Expected 'Authorization: Bearer <JWT>'", 422)
+    try:
+        with flask_app.app_context():
+            claims = decode_token(parts[1])
+    except pyjwt.ExpiredSignatureError:
+        raise APIError("Token has expired", 401)
+    except pyjwt.InvalidTokenError as error:
+        raise APIError(str(error), 422)
+    if await off_loop(BLOCKLIST_BLOCKS, token_blocklist.is_revoked, claims['jti']):
+        raise APIError("Token has been revoked", 401)
+    if claims.get('type') != 'access':
+        raise APIError("Only non-refresh tokens are allowed", 422)
+    return claims[flask_app.config['JWT_IDENTITY_CLAIM']]
+
+
+# Mismo límite que before_request en Flask (usa el nombre del endpoint de Flask)
+async def check_rate_limit(endpoint, client):
+    if not flask_app.config['RATELIMIT_ENABLED']:
+        return None
+    retry_after = await off_loop(RATELIMIT_BLOCKS, rate_limiter.hit, endpoint, client)
+    if retry_after:
+        return json_response({"message": "Too many requests, try again later"}, 429,
+                             {'Retry-After': str(retry_after)})
+    return None
+
+
+def is_not_modified(request, etag):
+    return etag is not None and parse_etags(request.headers.get('If-None-Match')).contains_weak(etag)
+
+
+def with_etag(response, etag):
+    if etag is not None:
+        response.headers['ETag'] = f'"{etag}"'
+    return response
+
+
+# Envuelve un handler async: autenticación, límite de peticiones, errores y CORS
+def endpoint(flask_endpoint):
+    def decorator(handler):
+        async def wrapper(request):
+            try:
+                user_id = await current_user_id(request)
+                response = await check_rate_limit(flask_endpoint, 'user:' + user_id)
+                if response is None:
+                    response = await handler(request, user_id)
+            except APIError as error:
+                response = json_response({"msg": error.message}, error.status_code)
+            except APIException as error:
+                response = json_response(error.to_dict(), error.status_code)
+            # Igual que CORS(app) con la configuración por defecto
+            if 'origin' in request.headers:
+                response.headers['Access-Control-Allow-Origin'] = '*'
+            return response
+        return wrapper
+    return decorator
+
+
+database_uri = async_database_uri(flask_app.config['SQLALCHEMY_DATABASE_URI'])
+engine = None
+if database_uri is not None:
+    engine = create_async_engine(database_uri,
+                                 **async_engine_options(flask_app.config['SQLALCHEMY_DATABASE_URI']))
+
+
+def catalog_list(resource, cache, flask_endpoint):
+    @endpoint(flask_endpoint)
+    async def handler(request, user_id):
+        def versions():
+            version = cache.version()
+            cache_key = catalog_cache_key(resource, request_args(request),
+                                          list_cache_key(request.query_params.multi_items()))
+            return version, cache_key
+
+        version, cache_key = await off_loop(CACHE_BLOCKS, versions)
+        etag = versioned_etag(resource, version, cache_key)
+        if is_not_modified(request, etag):
+            return with_etag(Response(status_code=304), etag)
+
+        page = await off_loop(CACHE_BLOCKS, cache.get, cache_key, version)
+        if page is MISSING:
+            statement, build_page = catalog_page_query(resource, request_args(request))
+            async with engine.connect() as connection:
+                page = build_page((await connection.execute(statement)).all())
+            await off_loop(CACHE_BLOCKS, cache.set, cache_key, page, version)
+
+        return with_etag(json_response(page), etag)
+    return handler
+
+
+# Igual que catalog_item() en app.py, con la consulta async si falla la caché
+async def catalog_item(resource, item_id):
+    spec = CATALOG[resource]
+    version = await off_loop(CACHE_BLOCKS, spec['cache'].version)
+    data = await off_loop(CACHE_BLOCKS, spec['cache'].get, item_id, version)
+    if data is MISSING:
+        async with engine.connect() as connection:
+            row = (await connection.execute(catalog_item_query(resource, item_id))).first()
+        data = None if row is None else spec['serializer'].one(row)
+        await off_loop(CACHE_BLOCKS, spec['cache'].set, item_id, data, version)
+    return data
+
+
+def catalog_detail(resource, flask_endpoint):
+    spec = CATALOG[resource]
+
+    @endpoint(flask_endpoint)
+    async def handler(request, user_id):
+        args = request_args(request)
+        fields = spec['serializer'].requested_fields(args)
+
+        data = await catalog_item(resource, request.path_params['item_id'])
+        if data is None:
+            return json_response({"message": spec['not_found']}, 404)
+
+        result = spec['serializer'].project(data, fields)
+        expand = get_expand(resource, args)
+        if expand:
+            result = dict(result)
+            for name in expand:
+                related, foreign_key, output = EXPANSIONS[resource][name]
+                related_id = data[foreign_key.key]
+                result[output] = None if related_id is None else await catalog_item(related, related_id)
+        return json_response(result)
+    return handler
+
+
+@endpoint('get_user_favorites')
+async def get_user_favorites(request, user_id):
+    include = get_include(request_args(request))
+    # El sub del JWT es un str; asyncpg no lo acepta para una columna integer
+    user_id = int(user_id)
+    versions = await off_loop(CACHE_BLOCKS, favorites_versions, user_id)
+    etag = favorites_etag(user_id, versions, include)
+    if is_not_modified(request, etag):
+        return with_etag(Response(status_code=304), etag)
+
+    async with engine.connect() as connection:
+        favorites = (await connection.execute(favorites_query(user_id))).all()
+        favorites_data = serialize_favorites(favorites)
+
+        # Igual que en app.py: una consulta IN por tipo para lo que no está en la caché
+        records = {}
+        for resource, ids in favorite_include_ids(favorites_data, include).items():
+            items, missing = await off_loop(CACHE_BLOCKS, cached_catalog_items, resource, ids, versions[resource])
+            if missing:
+                rows = (await connection.execute(catalog_items_query(resource, missing))).all()
+                await off_loop(CACHE_BLOCKS, store_catalog_items, resource, items, missing, rows, versions[resource])
+            records[resource] = items
+
+    return with_etag(json_response(attach_includes(favorites_data, records)), etag)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    yield
+    if engine is not None:
+        await engine.dispose()
+
+
+routes = []
+if engine is not None:
+    routes += [
+        Route('/characters', catalog_list('characters', character_cache, 'get_all_characters')),
+        Route('/character/{item_id:int}', catalog_detail('characters', 'get_character')),
+        Route('/planets', catalog_list('planets', planet_cache, 'get_all_planets')),
+        Route('/planet/{item_id:int}', catalog_detail('planets', 'get_planet')),
+        Route('/users/favorites', get_user_favorites),
+    ]
+# El resto de rutas (escrituras, admin, token...) las atiende Flask
+routes.append(Mount('/', WSGIMiddleware(flask_app, workers=int(os.getenv('WSGI_THREADS', 10)))))
+
+application = Starlette(routes=routes, lifespan=lifespan)
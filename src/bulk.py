@@ -0,0 +1,200 @@
+"""
+Bulk create/update/delete for the catalog tables (characters and planets).
+Rows are validated in memory, existing IDs are checked with one IN query per
+chunk and every chunk is written with executemany in its own transaction.
+"""
+from sqlalchemy.exc import SQLAlchemyError
+from models import db, Characters, Planets, Favorites, resolve_homeworld_ids, link_homeworlds
+
+# Mantienen Characters.homeworld_id al escribir filas: `rows` son pares (id, valores)
+def resolve_character_homeworlds(rows):
+    ids = [row_id for row_id, values in rows if 'homeworld' in values]
+    if ids:
+        resolve_homeworld_ids(Characters.character_id.in_(ids))
+
+def link_planet_homeworlds(rows):
+    link_homeworlds(values['name'] for _, values in rows if 'name' in values)
+
+# Rango de las columnas Integer (int4 en Postgres) y de las BigInteger (int8)
+INT_RANGE = (-2 ** 31, 2 ** 31 - 1)
+INT_RANGES = {'population': (-2 ** 63, 2 ** 63 - 1)}
+
+# Campos editables por recurso: nombre -> (tipo, longitud máxima, obligatorio al crear)
+BULK_RESOURCES = {
+    'characters': {
+        'model': Characters,
+        'key': Characters.character_id,
+        'fields': {
+            'name': (str, 150, True),
+            'species': (str, 100, True),
+            'homeworld': (str, 100, True),
+            'gender': (str, 20, False),
+        },
+        'after_write': resolve_character_homeworlds,
+        'favorites_key': Favorites.character_id,
+    },
+    'planets': {
+        'model': Planets,
+        'key': Planets.planet_id,
+        'fields': {
+            'name': (str, 100, True),
+            'climate': (str, 100, True),
+            'terrain': (str, 100, True),
+            'population': (int, None, False),
+        },
+        'after_write': link_planet_homeworlds,
+        'favorites_key': Favorites.planet_id,
+    },
+}
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def validate_row(row, fields, creating):
+    if not isinstance(row, dict):
+        return None, ["Row must be an object"]
+    errors = []
+    values = {}
+    for name, (kind, max_length, required) in fields.items():
+        if name not in row:
+            if creating and required:
+                errors.append(f"Missing required field '{name}'")
+            elif creating:
+                values[name] = None
+            continue
+        value = row[name]
+        if value is None:
+            if name == 'name':
+                errors.append("'name' cannot be null")
+            values[name] = None
+            continue
+        low, high = INT_RANGES.get(name, INT_RANGE)
+        if not isinstance(value, kind) or isinstance(value, bool):
+            errors.append(f"'{name}' must be of type {kind.__name__}")
+        elif max_length is not None and len(value) > max_length:
+            errors.append(f"'{name}' must be at most {max_length} characters")
+        elif kind is int and not low <= value <= high:
+            errors.append(f"'{name}' must be between {low} and {high}")
+        else:
+            values[name] = value
+    unknown = set(row) - set(fields) - {'id'}
+    if unknown:
+        errors.append("Unknown fields: " + ", ".join(sorted(unknown)))
+    return values, errors
+
+def parse_id(value):
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    return None
+
+# Ejecuta write(chunk) por bloques; si un bloque falla se deshace solo ese bloque
+def write_in_chunks(pending, chunk_size, write, results):
+    for chunk in chunked(pending, chunk_size):
+        try:
+            for index, outcome in write(chunk):
+                results[index] = outcome
+            db.session.commit()
+        except SQLAlchemyError as error:
+            db.session.rollback()
+            message = str(getattr(error, 'orig', None) or error).splitlines()[0]
+            for index, _ in chunk:
+                results[index] = {'status': 'error', 'errors': [message]}
+
+def finish(results):
+    return [dict(index=index, **results[index]) for index in sorted(results)]
+
+def bulk_create(resource, rows, chunk_size):
+    spec = BULK_RESOURCES[resource]
+    key = spec['key']
+    results = {}
+    pending = []
+    for index, row in enumerate(rows):
+        values, errors = validate_row(row, spec['fields'], creating=True)
+        if errors:
+            results[index] = {'status': 'error', 'errors': errors}
+        else:
+            pending.append((index, values))
+
+    def write(chunk):
+        statement = db.insert(spec['model']).returning(key, sort_by_parameter_order=True)
+        new_ids = db.session.scalars(statement, [values for _, values in chunk]).all()
+        spec['after_write']([(new_id, values) for (_, values), new_id in zip(chunk, new_ids)])
+        for (index, _), new_id in zip(chunk, new_ids):
+            yield index, {'status': 'created', 'id': new_id}
+
+    write_in_chunks(pending, chunk_size, write, results)
+    return finish(results)
+
+def bulk_update(resource, rows, chunk_size):
+    spec = BULK_RESOURCES[resource]
+    key = spec['key']
+    results = {}
+    pending = []
+    seen = set()
+    for index, row in enumerate(rows):
+        values, errors = validate_row(row, spec['fields'], creating=False)
+        row_id = parse_id(row.get('id')) if isinstance(row, dict) else None
+        if row_id is None:
+            errors.append("'id' must be an integer")
+        elif row_id in seen:
+            errors.append(f"Duplicated id {row_id}")
+        elif not values and not errors:
+            errors.append("Nothing to update")
+        if errors:
+            results[index] = {'status': 'error', 'errors': errors}
+        else:
+            seen.add(row_id)
+            pending.append((index, dict(values, **{key.key: row_id})))
+
+    def write(chunk):
+        ids = [values[key.key] for _, values in chunk]
+        existing = set(db.session.scalars(db.select(key).where(key.in_(ids))))
+        found = [(index, values) for index, values in chunk if values[key.key] in existing]
+        if found:
+            # UPDATE por clave primaria con executemany
+            db.session.execute(db.update(spec['model']), [values for _, values in found])
+            spec['after_write']([(values[key.key], values) for _, values in found])
+        for index, values in chunk:
+            if values[key.key] in existing:
+                yield index, {'status': 'updated', 'id': values[key.key]}
+            else:
+                yield index, {'status': 'error', 'errors': ["Not found"]}
+
+    write_in_chunks(pending, chunk_size, write, results)
+    return finish(results)
+
+def bulk_delete(resource, ids, chunk_size):
+    spec = BULK_RESOURCES[resource]
+    key = spec['key']
+    results = {}
+    pending = []
+    for index, value in enumerate(ids):
+        row_id = parse_id(value)
+        if row_id is None:
+            results[index] = {'status': 'error', 'errors': ["id must be an integer"]}
+        else:
+            pending.append((index, row_id))
+
+    def write(chunk):
+        ids = [row_id for _, row_id in chunk]
+        existing = set(db.session.scalars(db.select(key).where(key.in_(ids))))
+        if existing:
+            # Los favoritos que apuntan a estos registros se borran antes con un
+            # solo DELETE para que la FK no haga fallar el bloque entero
+            db.session.execute(
+                db.delete(Favorites).where(spec['favorites_key'].in_(existing))
+                .execution_options(synchronize_session=False)
+            )
+            db.session.execute(
+                db.delete(spec['model']).where(key.in_(existing))
+                .execution_options(synchronize_session=False)
+            )
+        for index, row_id in chunk:
+            if row_id in existing:
+                yield index, {'status': 'deleted', 'id': row_id}
+            else:
+                yield index, {'status': 'error', 'errors': ["Not found"]}
+
+    write_in_chunks(pending, chunk_size, write, results)
+    return finish(results)
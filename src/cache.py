@@ -0,0 +1,331 @@
+"""
+Caches used in front of the catalog lookups: an in-process LRU and pluggable
+backends (memory, SQLite file or Redis) shared between gunicorn workers.
+"""
+import json
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+MISSING = object()
+
+class LRUCache:
+    # Caché LRU con tamaño máximo y caducidad (TTL) por entrada, segura entre hilos
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+#### Backends ####
+# Todas las implementaciones ofrecen get/set/delete, un contador de versión por
+# espacio de nombres (get_version/bump_version) y stats. Los backends compartidos
+# guardan los valores como JSON para que cualquier worker los pueda leer.
+
+class CacheBackend:
+    # True si todos los workers ven los mismos valores y versiones
+    shared = True
+    # True si todos los workers ven las mismas versiones (basta para los ETag)
+    shared_versions = True
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def get_version(self, namespace):
+        raise NotImplementedError
+
+    def bump_version(self, namespace):
+        raise NotImplementedError
+
+    def stats(self):
+        return {'backend': type(self).__name__}
+
+
+class MemoryBackend(CacheBackend):
+    # Solo para un proceso: cada worker de gunicorn tiene su propia copia.
+    # Con `versions` (p. ej. DatabaseVersions) los contadores de versión se leen
+    # de ahí y son los mismos en todos los workers; sin él, son del proceso.
+    shared = False
+
+    def __init__(self, maxsize=1024, ttl=300, versions=None):
+        self._cache = LRUCache(maxsize, ttl)
+        self.versions = versions
+        # Las versiones arrancan en un valor aleatorio para que un ETag emitido
+        # antes de reiniciar el proceso no coincida con datos nuevos
+        self._base = random.getrandbits(32)
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, value, ttl):
+        self._cache.set(key, value, ttl)
+
+    def delete(self, key):
+        self._cache.delete(key)
+
+    @property
+    def shared_versions(self):
+        return self.versions is not None
+
+    def get_version(self, namespace):
+        if self.versions is not None:
+            return self.versions.get_version(namespace)
+        return self._versions.get(namespace, self._base)
+
+    def bump_version(self, namespace):
+        if self.versions is not None:
+            return self.versions.bump_version(namespace)
+        with self._lock:
+            self._versions[namespace] = self._versions.get(namespace, self._base) + 1
+            return self._versions[namespace]
+
+    def stats(self):
+        return dict(self._cache.stats(), backend='memory',
+                    versions='memory' if self.versions is None else 'database')
+
+
+class DatabaseVersions:
+    # Contadores de versión en una tabla (namespace, version) de la base de datos
+    # de la API. Usa sus propias conexiones del engine primario: bump_version se
+    # llama después del commit de la sesión y las réplicas podrían ir con retraso.
+    def __init__(self, engine, table):
+        self.engine = engine
+        self.table = table
+
+    def get_version(self, namespace):
+        with self.engine.connect() as connection:
+            version = connection.execute(
+                select(self.table.c.version).where(self.table.c.namespace == namespace)
+            ).scalar()
+        return version or 0
+
+    def _increment(self, connection, namespace):
+        return connection.execute(
+            update(self.table).where(self.table.c.namespace == namespace)
+            .values(version=self.table.c.version + 1)
+        ).rowcount
+
+    # UPDATE y, si la fila no existe, INSERT (sin upsert, que cambia con cada motor)
+    def bump_version(self, namespace):
+        try:
+            with self.engine.begin() as connection:
+                if not self._increment(connection, namespace):
+                    connection.execute(insert(self.table).values(namespace=namespace, version=1))
+        except IntegrityError:
+            # Otro worker ha creado la fila a la vez
+            with self.engine.begin() as connection:
+                self._increment(connection, namespace)
+        return self.get_version(namespace)
+
+
+class FileBackend(CacheBackend):
+    # Caché compartida entre los workers de una misma máquina sobre un fichero SQLite.
+    # Cada tabla es un espacio de claves independiente; con maxsize=None solo se
+    # borran las entradas caducadas (p. ej. la lista de tokens revocados, que
+    # nunca debe perder entradas por la limpieza de la caché de respuestas).
+    def __init__(self, path, maxsize=10000, table='cache_entries'):
+        self.path = path
+        self.maxsize = maxsize
+        self.table = table
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._writes = 0
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache_versions "
+                "(namespace TEXT PRIMARY KEY, version INTEGER NOT NULL)"
+            )
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key):
+        row = self._connection().execute(
+            f"SELECT value FROM {self.table} WHERE key = ? AND expires_at > ?",
+            (key, time.time())
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return MISSING
+        self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl):
+        connection = self._connection()
+        connection.execute(
+            f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value), time.time() + ttl)
+        )
+        self._writes += 1
+        # Limpieza periódica: caducados primero y luego los más antiguos
+        if self._writes % 100 == 0:
+            with connection:
+                connection.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (time.time(),))
+                if self.maxsize is not None:
+                    connection.execute(
+                        f"DELETE FROM {self.table} WHERE key IN (SELECT key FROM {self.table} "
+                        "ORDER BY expires_at DESC LIMIT -1 OFFSET ?)", (self.maxsize,)
+                    )
+
+    def delete(self, key):
+        self._connection().execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def get_version(self, namespace):
+        row = self._connection().execute(
+            "SELECT version FROM cache_versions WHERE namespace = ?", (namespace,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def bump_version(self, namespace):
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "INSERT INTO cache_versions (namespace, version) VALUES (?, 1) "
+                "ON CONFLICT(namespace) DO UPDATE SET version = version + 1",
+                (namespace,)
+            )
+        return self.get_version(namespace)
+
+    def stats(self):
+        size = self._connection().execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        return {'backend': 'file', 'path': self.path, 'size': size, 'maxsize': self.maxsize,
+                'hits': self.hits, 'misses': self.misses}
+
+
+class RedisBackend(CacheBackend):
+    # Caché compartida entre máquinas; necesita el paquete opcional `redis`
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND uses redis:// but the 'redis' package is not installed")
+        self.client = redis.Redis.from_url(url)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.client.get(key)
+        if value is None:
+            self.misses += 1
+            return MISSING
+        self.hits += 1
+        return json.loads(value)
+
+    def set(self, key, value, ttl):
+        self.client.set(key, json.dumps(value), ex=ttl)
+
+    def delete(self, key):
+        self.client.delete(key)
+
+    def get_version(self, namespace):
+        return int(self.client.get(f"{namespace}:version") or 0)
+
+    def bump_version(self, namespace):
+        return self.client.incr(f"{namespace}:version")
+
+    def stats(self):
+        return {'backend': 'redis', 'hits': self.hits, 'misses': self.misses}
+
+
+def create_backend(url, maxsize=10000, ttl=300):
+    # memory | file:///ruta/al/fichero.db | redis://host:6379/0
+    if not url or url == 'memory':
+        return MemoryBackend(maxsize, ttl)
+    if url.startswith('file://'):
+        return FileBackend(url[len('file://'):], maxsize)
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisBackend(url)
+    raise ValueError(f"Unknown cache backend: {url}")
+
+
+class VersionedCache:
+    # Las claves llevan la versión del espacio de nombres: al invalidar se sube la
+    # versión y todas las entradas anteriores dejan de leerse en todos los workers.
+    def __init__(self, backend, namespace, ttl=300):
+        self.backend = backend
+        self.namespace = namespace
+        self.ttl = ttl
+
+    # `version` se lee una sola vez por petición con version() y se usa tanto
+    # para leer como para guardar (y para el ETag): si otro worker sube la
+    # versión mientras se consulta la base de datos, las filas antiguas quedan
+    # guardadas bajo la versión ya obsoleta y no bajo la nueva
+    def _key(self, key, version):
+        return f"{self.namespace}:{version}:{key}"
+
+    def get(self, key, version):
+        return self.backend.get(self._key(key, version))
+
+    def set(self, key, value, version):
+        self.backend.set(self._key(key, version), value, self.ttl)
+
+    def invalidate(self):
+        return self.backend.bump_version(self.namespace)
+
+    def version(self):
+        return self.backend.get_version(self.namespace)
@@ -0,0 +1,62 @@
+"""
+Flask CLI commands:
+
+    flask import-catalog planets planets.json
+    flask import-catalog characters people.ndjson --chunk-size 10000
+    flask import-catalog characters people.csv --restart
+    flask import-catalog characters people.json --planets-file planets.json --species-file species.json
+    flask rebuild-favorites-counts
+"""
+import click
+from bulk import BULK_RESOURCES
+from importer import FORMATS, import_file
+from models import rebuild_favorites_counts
+
+
+def setup_commands(app):
+
+    @app.cli.command('import-catalog')
+    @click.argument('resource', type=click.Choice(sorted(BULK_RESOURCES)))
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--format', 'file_format', type=click.Choice(FORMATS),
+                  help='File format (by default from the extension).')
+    @click.option('--chunk-size', default=5000, show_default=True,
+                  help='Rows validated, deduplicated and written per transaction.')
+    @click.option('--checkpoint', 'checkpoint_path',
+                  help='Checkpoint file (by default PATH.checkpoint).')
+    @click.option('--restart', is_flag=True, help='Ignore an existing checkpoint and start over.')
+    @click.option('--show-errors', is_flag=True, help='Print the validation errors of each rejected row.')
+    @click.option('--planets-file', 'planets_path', type=click.Path(exists=True, dir_okay=False),
+                  help='SWAPI planets dump used to turn homeworld URLs into planet names.')
+    @click.option('--species-file', 'species_path', type=click.Path(exists=True, dir_okay=False),
+                  help='SWAPI species dump used to turn species URLs into species names.')
+    def import_catalog(resource, path, file_format, chunk_size, checkpoint_path, restart, show_errors,
+                       planets_path, species_path):
+        """Load characters or planets from a JSON, NDJSON or CSV dump."""
+        def progress(state):
+            click.echo(
+                f"{state['processed']} rows: {state['inserted']} inserted, "
+                f"{state['duplicates']} duplicates, {state['invalid']} invalid "
+                f"({state['rows_per_sec']} rows/s)", err=True
+            )
+
+        def errors(number, row_errors):
+            if show_errors:
+                click.echo(f"Row {number}: " + "; ".join(row_errors), err=True)
+
+        summary = import_file(
+            resource, path, file_format, max(1, chunk_size), checkpoint_path,
+            resume=not restart, progress=progress, errors=errors, planets_path=planets_path,
+            species_path=species_path
+        )
+        click.echo(
+            f"Imported {summary['inserted']} {resource} in {summary['seconds']}s "
+            f"({summary['duplicates']} duplicates, {summary['invalid']} invalid)"
+        )
+
+    @app.cli.command('rebuild-favorites-counts')
+    def rebuild_counts():
+        """Recompute favorites_count on planets and characters from the favorites table."""
+        # Pensado para ejecutarse de forma periódica (cron) o tras cambios manuales
+        rebuild_favorites_counts()
+        click.echo("Favorites counts rebuilt")
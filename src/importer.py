@@ -0,0 +1,226 @@
+"""
+Streaming import of catalog dumps (JSON, NDJSON or CSV, SWAPI-style) into
+characters or planets. Rows are normalized, validated with the bulk rules and
+deduplicated by name (within the file and against the table) in chunks.
+SWAPI homeworld and species URLs are replaced by the names taken from a
+planets or species dump (--planets-file, --species-file). Each chunk is loaded with COPY on Postgres or executemany elsewhere, in its own
+transaction, and a checkpoint file records how far the import got so an
+interrupted load can resume.
+"""
+import csv
+import io
+import json
+import os
+import re
+import time
+from sqlalchemy import insert
+from bulk import BULK_RESOURCES, validate_row
+from models import db, Characters, link_homeworlds
+from invalidation import mark_changed, TABLE_NAMESPACES
+
+try:
+    import ijson
+except ImportError:  # ijson es opcional: sin él un .json se carga entero en memoria
+    ijson = None
+
+FORMATS = ('json', 'ndjson', 'csv')
+
+# https://swapi.dev/api/planets/1/ (o swapi.info, swapi.py4e.com...): el recurso
+# y el ID en SWAPI, que no tiene por qué coincidir con el de la tabla
+SWAPI_URL = re.compile(r'^https?://[^/]+/api/(\w+)/(\d+)/?$')
+
+# Campos que en SWAPI son URL -> recurso de SWAPI al que apuntan
+SWAPI_LINKS = {'homeworld': 'planets', 'species': 'species'}
+
+
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    if extension == 'jsonl':
+        return 'ndjson'
+    if extension not in FORMATS:
+        raise ValueError(f"Cannot detect the format of {path}, use --format")
+    return extension
+
+
+# Genera los registros del fichero como diccionarios, uno a uno
+def read_records(path, file_format):
+    if file_format == 'csv':
+        with open(path, newline='', encoding='utf-8') as source:
+            yield from csv.DictReader(source)
+    elif file_format == 'ndjson':
+        with open(path, encoding='utf-8') as source:
+            for line in source:
+                if line.strip():
+                    yield json.loads(line)
+    elif ijson is not None:
+        with open(path, 'rb') as source:
+            # Una lista de registros o un volcado de SWAPI ({"results": [...]})
+            first = source.read(1024).lstrip()[:1]
+            source.seek(0)
+            yield from ijson.items(source, 'item' if first == b'[' else 'results.item', use_float=True)
+    else:
+        with open(path, encoding='utf-8') as source:
+            data = json.load(source)
+        yield from data['results'] if isinstance(data, dict) else data
+
+
+# (recurso, ID de SWAPI) -> nombre, a partir de los registros (con "url") de un
+# volcado de planetas o especies
+def swapi_names(path, file_format=None):
+    names = {}
+    for record in read_records(path, file_format or detect_format(path)):
+        match = SWAPI_URL.match(str(record.get('url', '')).strip())
+        if match and record.get('name'):
+            names[match.group(1), int(match.group(2))] = record['name'].strip()
+    return names
+
+
+# Adapta los valores de SWAPI/CSV a los tipos de la tabla: "unknown" y "" son
+# null, las listas (species) se quedan con el primer elemento, los enteros
+# pueden venir como texto con separadores de miles y las URL de homeworld y
+# species se cambian por el nombre (null si no está en `linked_names`)
+def normalize(record, fields, linked_names=None):
+    if not isinstance(record, dict):
+        return record
+    row = {}
+    for name, (kind, max_length, required) in fields.items():
+        if name not in record:
+            continue
+        value = record[name]
+        if isinstance(value, list):
+            value = value[0] if value else None
+        if isinstance(value, str):
+            value = value.strip()
+            if value.lower() in ('', 'unknown', 'n/a', 'none') and name != 'name':
+                value = None
+        if kind is int and isinstance(value, str):
+            digits = value.replace(',', '').replace('_', '')
+            value = int(digits) if digits.isdigit() else value
+        elif kind is int and isinstance(value, float) and value.is_integer():
+            value = int(value)
+        if name in SWAPI_LINKS and isinstance(value, str):
+            match = SWAPI_URL.match(value)
+            if match and match.group(1) == SWAPI_LINKS[name]:
+                value = (linked_names or {}).get((match.group(1), int(match.group(2))))
+        row[name] = value
+    return row
+
+
+def copy_rows(model, columns, rows):
+    # COPY ... FROM STDIN con el cursor de psycopg2 de la conexión de la sesión
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(['\\N' if row[column] is None else row[column] for column in columns])
+    buffer.seek(0)
+    cursor = db.session.connection().connection.cursor()
+    cursor.copy_expert(
+        f"COPY {model.__tablename__} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+        buffer
+    )
+    # COPY no pasa por la sesión: la caché se invalida igual al hacer commit
+    mark_changed(db.session, *TABLE_NAMESPACES[model.__tablename__])
+
+
+def load_rows(model, columns, rows):
+    dialect = db.session.get_bind().dialect
+    if dialect.name == 'postgresql' and dialect.driver == 'psycopg2':
+        copy_rows(model, columns, rows)
+    else:
+        db.session.execute(insert(model), rows)
+
+
+class Checkpoint:
+    # Guarda cuántos registros del fichero ya están procesados y los contadores.
+    # Si el fichero cambia (tamaño o fecha) el checkpoint no se usa.
+    def __init__(self, path, source):
+        self.path = path
+        stat = os.stat(source)
+        self.source = {'path': os.path.abspath(source), 'size': stat.st_size, 'mtime': stat.st_mtime}
+        self.state = {'processed': 0, 'inserted': 0, 'duplicates': 0, 'invalid': 0}
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path) as checkpoint_file:
+            saved = json.load(checkpoint_file)
+        if saved.get('source') != self.source:
+            return False
+        self.state.update(saved['state'])
+        return True
+
+    def save(self):
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as checkpoint_file:
+            json.dump({'source': self.source, 'state': self.state}, checkpoint_file)
+        os.replace(temporary, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def import_file(resource, path, file_format=None, chunk_size=5000, checkpoint_path=None,
+                resume=True, progress=None, errors=None, planets_path=None, species_path=None):
+    spec = BULK_RESOURCES[resource]
+    model, fields = spec['model'], spec['fields']
+    names = {}
+    for linked_path in (planets_path, species_path):
+        if linked_path:
+            names.update(swapi_names(linked_path))
+    columns = list(fields)
+    file_format = file_format or detect_format(path)
+    checkpoint = Checkpoint(checkpoint_path or path + '.checkpoint', path)
+    if not resume or not checkpoint.load():
+        checkpoint.state.update(processed=0, inserted=0, duplicates=0, invalid=0)
+    state = checkpoint.state
+    start = time.perf_counter()
+    skip = state['processed']
+    # Los nombres de esta importación ya vistos (los anteriores se comprueban en la tabla)
+    seen = set()
+
+    def flush(chunk, consumed):
+        names = [row['name'] for row in chunk]
+        existing = set(db.session.scalars(
+            db.select(model.name).where(model.name.in_(names))
+        )) if names else set()
+        fresh = [row for row in chunk if row['name'] not in existing]
+        if fresh:
+            load_rows(model, columns, fresh)
+            # Sin IDs (COPY no los devuelve): se enlazan por nombre de planeta
+            if model is Characters:
+                link_homeworlds(row['homeworld'] for row in fresh)
+            else:
+                link_homeworlds(row['name'] for row in fresh)
+        db.session.commit()
+        state['processed'] += consumed
+        state['inserted'] += len(fresh)
+        state['duplicates'] += len(chunk) - len(fresh)
+        checkpoint.save()
+        if progress is not None:
+            elapsed = time.perf_counter() - start
+            progress(dict(state, rows_per_sec=round((state['processed'] - skip) / elapsed, 1) if elapsed else 0))
+
+    chunk, consumed = [], 0
+    for number, record in enumerate(read_records(path, file_format)):
+        if number < skip:
+            continue
+        consumed += 1
+        values, row_errors = validate_row(normalize(record, fields, names), fields, True)
+        if row_errors:
+            state['invalid'] += 1
+            if errors is not None:
+                errors(number, row_errors)
+        elif values['name'] in seen:
+            state['duplicates'] += 1
+        else:
+            seen.add(values['name'])
+            chunk.append({column: values.get(column) for column in columns})
+        if consumed >= chunk_size:
+            flush(chunk, consumed)
+            chunk, consumed = [], 0
+    if consumed:
+        flush(chunk, consumed)
+
+    checkpoint.remove()
+    return dict(state, seconds=round(time.perf_counter() - start, 2))
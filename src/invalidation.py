@@ -0,0 +1,66 @@
+"""
+Cache and ETag invalidation driven by SQLAlchemy session events, so every
+writer (the API handlers, Flask-Admin, the bulk routes and the CLI commands)
+invalidates the same way. While a transaction runs, the namespaces it touches are
+collected from ORM flushes and from the INSERT/UPDATE/DELETE statements run
+through the session; their versions are bumped once it commits.
+
+A statement can name the namespaces it touches with the `invalidates`
+execution option (an empty tuple for writes that do not change any cached
+data, such as the favorites counters).
+"""
+from sqlalchemy import event
+
+# Tabla escrita -> espacios de nombres de la caché que deja obsoletos.
+# Cambiar planetas puede enlazar o desenlazar el homeworld de los personajes.
+# Las sentencias sobre favorites indican el usuario con `invalidates`; sin él
+# se sube la versión común a todos los usuarios.
+TABLE_NAMESPACES = {
+    'planets': ('planets', 'characters'),
+    'characters': ('characters',),
+    'favorites': ('favorites',),
+}
+
+
+def favorites_namespace(user_id):
+    return f'favorites:{user_id}'
+
+
+def mark_changed(session, *namespaces):
+    session.info.setdefault('changed_namespaces', set()).update(namespaces)
+
+
+def instance_namespaces(instance):
+    table = getattr(instance, '__tablename__', None)
+    if table == 'favorites':
+        return (favorites_namespace(instance.user_id),)
+    return TABLE_NAMESPACES.get(table, ())
+
+
+# Registra los listeners en `session`; bump(namespace) se llama tras el commit
+def track_changes(session, bump):
+    @event.listens_for(session, 'after_flush')
+    def collect_flushed(session, flush_context):
+        for instance in session.new | session.deleted:
+            mark_changed(session, *instance_namespaces(instance))
+        for instance in session.dirty:
+            if session.is_modified(instance, include_collections=False):
+                mark_changed(session, *instance_namespaces(instance))
+
+    @event.listens_for(session, 'do_orm_execute')
+    def collect_statement(orm_execute_state):
+        if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+            return
+        namespaces = orm_execute_state.execution_options.get('invalidates')
+        if namespaces is None:
+            namespaces = TABLE_NAMESPACES.get(orm_execute_state.statement.table.name, ())
+        mark_changed(orm_execute_state.session, *namespaces)
+
+    @event.listens_for(session, 'after_commit')
+    def bump_changed(session):
+        for namespace in sorted(session.info.pop('changed_namespaces', ())):
+            bump(namespace)
+
+    @event.listens_for(session, 'after_rollback')
+    def discard_changed(session):
+        session.info.pop('changed_namespaces', None)
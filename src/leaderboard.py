@@ -0,0 +1,89 @@
+"""
+In-memory "most favorited" ranking per worker. The top `capacity` rows are
+read from the favorites_count index and kept sorted, so /favorites/top only
+slices a list. Counter changes committed by this worker are applied right
+away (with heapq, keeping the K largest). Changes from other workers show up
+when the ranking is reloaded after `ttl` seconds.
+"""
+import heapq
+import threading
+import time
+from sqlalchemy import event
+from models import db
+
+
+class TopFavorites:
+    def __init__(self, model, key, key_name, capacity=100, ttl=30):
+        self.model = model
+        self.key = key
+        self.key_name = key_name
+        self.capacity = capacity
+        self.ttl = ttl
+        self.entries = {}
+        self.ranking = []
+        self.expires_at = 0
+        self._lock = threading.Lock()
+
+    def load(self):
+        count = self.model.favorites_count
+        rows = db.session.execute(
+            db.select(self.key, self.model.name, count)
+            .where(count > 0)
+            .order_by(count.desc(), self.key)
+            .limit(self.capacity)
+        ).all()
+        with self._lock:
+            self.entries = {item_id: (name, favorites) for item_id, name, favorites in rows}
+            self._rank()
+            self.expires_at = time.monotonic() + self.ttl
+
+    def top(self, limit):
+        if time.monotonic() >= self.expires_at:
+            self.load()
+        return self.ranking[:limit]
+
+    # Aplica contadores ya confirmados: counts = {id: (name, nuevo valor)}
+    def apply(self, delta, counts):
+        with self._lock:
+            if not counts:
+                # Sin RETURNING no se conocen los valores: recargar en la próxima lectura
+                self.expires_at = 0
+                return
+            full = len(self.entries) >= self.capacity
+            lowest = min((favorites for _, favorites in self.entries.values()), default=0)
+            for item_id, (name, favorites) in counts.items():
+                if item_id in self.entries:
+                    self.entries[item_id] = (name, favorites)
+                    # Al bajar, alguno que no está en memoria podría adelantarlo
+                    if delta < 0 and full:
+                        self.expires_at = 0
+                elif not full or favorites > lowest:
+                    self.entries[item_id] = (name, favorites)
+            self.entries = {
+                item_id: entry for item_id, entry in heapq.nlargest(
+                    self.capacity,
+                    ((item_id, entry) for item_id, entry in self.entries.items() if entry[1] > 0),
+                    key=lambda item: (item[1][1], -item[0])
+                )
+            }
+            self._rank()
+
+    def _rank(self):
+        self.ranking = [
+            {self.key_name: item_id, 'name': name, 'favorites': favorites}
+            for item_id, (name, favorites) in sorted(
+                self.entries.items(), key=lambda item: (-item[1][1], item[0])
+            )
+        ]
+
+
+# Pasa a los rankings los contadores de cada transacción cuando se confirma
+def track_favorites_counts(session, rankings):
+    @event.listens_for(session, 'after_commit')
+    def apply_counts(session):
+        for kind, ids, delta, counts in session.info.pop('favorites_counts', []):
+            rankings[kind].apply(delta, counts)
+
+    @event.listens_for(session, 'after_rollback')
+    def discard_counts(session):
+        session.info.pop('favorites_counts', None)
@@ -1,14 +1,29 @@
+import sqlite3
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.dialects import postgresql, sqlite
+from replicas import RoutingSession
+from passwords import needs_rehash
+from invalidation import favorites_namespace
 
-db = SQLAlchemy()
+# Las lecturas pueden ir a una réplica (ver replicas.py)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+# SQLite no comprueba las claves foráneas si no se activan en cada conexión
+@event.listens_for(Engine, "connect")
+def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
 
 # Tabla de usuarios
 class Users(db.Model):
     __tablename__ = 'users'
     user_id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(100), unique=True, nullable=False)
-    password_hash = db.Column(db.String(60), nullable=False)
+    password_hash = db.Column(db.String(255), nullable=False)
     username = db.Column(db.String(30), nullable=False)
     user_creation_date = db.Column(db.TIMESTAMP, nullable=False)
     favorites = db.relationship("Favorites", back_populates="user")
@@ -23,20 +38,34 @@ class Users(db.Model):
             "username": self.username
         }
 
-    def check_password(self, password):
-        return self.password_hash == password
+    # True si la contraseña está en texto plano o con un método/coste antiguo
+    def password_needs_rehash(self):
+        return needs_rehash(self.password_hash)
 
 
 # Tabla de planetas
 class Planets(db.Model):
     __tablename__ = 'planets'
+    # Índices para los filtros y ordenaciones de /planets (el id desempata la paginación)
+    __table_args__ = (
+        db.Index('ix_planets_name', 'name', 'planet_id'),
+        db.Index('ix_planets_climate', 'climate', 'planet_id'),
+        db.Index('ix_planets_terrain', 'terrain', 'planet_id'),
+        db.Index('ix_planets_population', 'population', 'planet_id'),
+        db.Index('ix_planets_favorites_count', 'favorites_count', 'planet_id'),
+    )
     planet_id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     climate = db.Column(db.String(100), nullable=True)
     terrain = db.Column(db.String(100), nullable=True)
-    population = db.Column(db.Integer, nullable=True)
+    # BigInteger: en SWAPI hay poblaciones de billones (Coruscant)
+    population = db.Column(db.BigInteger, nullable=True)
+    # Número de usuarios que lo tienen en favoritos (se actualiza junto con Favorites)
+    favorites_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     # Relación con Favorites
     favorites = db.relationship("Favorites", back_populates="planet")
+    # Personajes cuyo planeta natal es este (al borrar el planeta la FK queda en NULL)
+    residents = db.relationship("Characters", back_populates="homeworld_planet", passive_deletes=True)
 
     def __repr__(self):
         return '<Planet %r>' % self.name
@@ -54,13 +83,26 @@ class Planets(db.Model):
 # Tabla de personajes
 class Characters(db.Model):
     __tablename__ = 'characters'
+    # Índices para los filtros y ordenaciones de /characters
+    __table_args__ = (
+        db.Index('ix_characters_name', 'name', 'character_id'),
+        db.Index('ix_characters_species', 'species', 'character_id'),
+        db.Index('ix_characters_homeworld', 'homeworld', 'character_id'),
+        db.Index('ix_characters_gender', 'gender', 'character_id'),
+        db.Index('ix_characters_favorites_count', 'favorites_count', 'character_id'),
+        db.Index('ix_characters_homeworld_id', 'homeworld_id', 'character_id'),
+    )
     character_id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(150), nullable=False)
     species = db.Column(db.String(100), nullable=True)
     homeworld = db.Column(db.String(100), nullable=True)
     gender = db.Column(db.String(20), nullable=True)
+    favorites_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Planeta natal resuelto a partir de `homeworld` (el nombre se mantiene tal cual)
+    homeworld_id = db.Column(db.Integer, db.ForeignKey('planets.planet_id', name='fk_characters_homeworld_id_planets', ondelete='SET NULL'), nullable=True)
     # Relación con Favorites
     favorites = db.relationship("Favorites", back_populates="character")
+    homeworld_planet = db.relationship("Planets", back_populates="residents")
 
     def __repr__(self):
         return '<Character %r>' % self.name
@@ -78,6 +120,18 @@ class Characters(db.Model):
 # Tabla de favoritos
 class Favorites(db.Model):
     __tablename__ = 'favorites'
+    # Índices compuestos para leer los favoritos de un usuario sin recorrer la tabla
+    __table_args__ = (
+        db.Index('ix_favorites_user_id_planet_id', 'user_id', 'planet_id'),
+        db.Index('ix_favorites_user_id_character_id', 'user_id', 'character_id'),
+        # Un usuario no puede repetir el mismo planeta o personaje en favoritos
+        db.Index('uq_favorites_user_id_planet_id', 'user_id', 'planet_id', unique=True,
+                 postgresql_where=db.text('planet_id IS NOT NULL'),
+                 sqlite_where=db.text('planet_id IS NOT NULL')),
+        db.Index('uq_favorites_user_id_character_id', 'user_id', 'character_id', unique=True,
+                 postgresql_where=db.text('character_id IS NOT NULL'),
+                 sqlite_where=db.text('character_id IS NOT NULL')),
+    )
     favorite_id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
     planet_id = db.Column(db.Integer, db.ForeignKey('planets.planet_id'), nullable=True)
@@ -95,3 +149,184 @@ class Favorites(db.Model):
             "planet_id": self.planet_id,
             "character_id": self.character_id
         }
+
+
+# Versiones de la caché de respuestas (ver DatabaseVersions en cache.py) cuando
+# el backend de la caché es en memoria y no las comparte entre workers
+class CacheVersions(db.Model):
+    __tablename__ = 'cache_versions'
+    namespace = db.Column(db.String(120), primary_key=True)
+    version = db.Column(db.Integer, nullable=False)
+
+
+# INSERT ... ON CONFLICT DO NOTHING por motor de base de datos
+UPSERT_INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+# Inserta un favorito en una sola sentencia y devuelve (favorite_id, name), o None
+# si ya existía. Si el planeta/personaje no existe la FK lanza IntegrityError.
+def insert_favorite(user_id, planet_id=None, character_id=None):
+    if planet_id is not None:
+        item = {'planet_id': planet_id}
+        name = db.select(Planets.name).where(Planets.planet_id == planet_id)
+    else:
+        item = {'character_id': character_id}
+        name = db.select(Characters.name).where(Characters.character_id == character_id)
+
+    insert = UPSERT_INSERTS.get(db.engine.dialect.name)
+    if insert is None:
+        # Motores sin ON CONFLICT ... RETURNING: comprobar antes de insertar
+        if Favorites.query.filter_by(user_id=user_id, **item).first():
+            return None
+        favorite = Favorites(user_id=user_id, **item)
+        db.session.add(favorite)
+        db.session.flush()
+        inserted = db.session.execute(
+            db.select(db.literal(favorite.favorite_id).label('favorite_id'), name.scalar_subquery().label('name'))
+        ).first()
+    else:
+        statement = (
+            insert(Favorites)
+            .values(user_id=user_id, **item)
+            .on_conflict_do_nothing()
+            .returning(Favorites.favorite_id, name.scalar_subquery().label('name'))
+            .execution_options(invalidates=(favorites_namespace(user_id),))
+        )
+        inserted = db.session.execute(statement).first()
+
+    if inserted is not None:
+        adjust_favorites_counts([(planet_id, character_id)], 1)
+    return inserted
+
+# Inserta varios favoritos con un único INSERT multi-fila y devuelve el conjunto
+# de (planet_id, character_id) que se insertaron (los repetidos se ignoran).
+def bulk_insert_favorites(user_id, planet_ids=(), character_ids=()):
+    rows = [{'user_id': user_id, 'planet_id': planet_id, 'character_id': None}
+            for planet_id in planet_ids]
+    rows += [{'user_id': user_id, 'planet_id': None, 'character_id': character_id}
+             for character_id in character_ids]
+    if not rows:
+        return set()
+
+    insert = UPSERT_INSERTS.get(db.engine.dialect.name)
+    if insert is None:
+        existing = set(db.session.execute(
+            db.select(Favorites.planet_id, Favorites.character_id).where(
+                Favorites.user_id == user_id,
+                db.or_(Favorites.planet_id.in_(planet_ids),
+                       Favorites.character_id.in_(character_ids))
+            )
+        ).tuples())
+        rows = [row for row in rows if (row['planet_id'], row['character_id']) not in existing]
+        if rows:
+            db.session.execute(
+                db.insert(Favorites).execution_options(invalidates=(favorites_namespace(user_id),)), rows
+            )
+        inserted = {(row['planet_id'], row['character_id']) for row in rows}
+    else:
+        statement = (
+            insert(Favorites)
+            .values(rows)
+            .on_conflict_do_nothing()
+            .returning(Favorites.planet_id, Favorites.character_id)
+            .execution_options(invalidates=(favorites_namespace(user_id),))
+        )
+        inserted = set(db.session.execute(statement).tuples())
+
+    adjust_favorites_counts(inserted, 1)
+    return inserted
+
+# Elimina varios favoritos con un único DELETE y devuelve el conjunto de
+# (planet_id, character_id) que se borraron.
+def bulk_delete_favorites(user_id, planet_ids=(), character_ids=()):
+    if not planet_ids and not character_ids:
+        return set()
+
+    condition = db.and_(
+        Favorites.user_id == user_id,
+        db.or_(Favorites.planet_id.in_(planet_ids),
+               Favorites.character_id.in_(character_ids))
+    )
+    if not db.engine.dialect.delete_returning:
+        removed = set(db.session.execute(
+            db.select(Favorites.planet_id, Favorites.character_id).where(condition)
+        ).tuples())
+        db.session.execute(
+            db.delete(Favorites).where(condition)
+            .execution_options(synchronize_session=False, invalidates=(favorites_namespace(user_id),))
+        )
+    else:
+        statement = (
+            db.delete(Favorites)
+            .where(condition)
+            .returning(Favorites.planet_id, Favorites.character_id)
+            .execution_options(synchronize_session=False, invalidates=(favorites_namespace(user_id),))
+        )
+        removed = set(db.session.execute(statement).tuples())
+
+    adjust_favorites_counts(removed, -1)
+    return removed
+
+# Suma `delta` al contador de favoritos de los planetas y personajes de `pairs`
+# (pares (planet_id, character_id) como los que devuelven las funciones de
+# arriba), en la misma transacción que el cambio en Favorites. Los nuevos
+# valores quedan en session.info['favorites_counts'] para que el ranking en
+# memoria (leaderboard.py) se actualice al hacer commit sin volver a consultar.
+def adjust_favorites_counts(pairs, delta):
+    counts = {'planets': {}, 'characters': {}}
+    targets = (
+        ('planets', Planets, Planets.planet_id, {planet_id for planet_id, _ in pairs if planet_id is not None}),
+        ('characters', Characters, Characters.character_id,
+         {character_id for _, character_id in pairs if character_id is not None}),
+    )
+    for kind, model, key, ids in targets:
+        if not ids:
+            continue
+        statement = (
+            db.update(model)
+            .where(key.in_(ids))
+            .values(favorites_count=model.favorites_count + delta)
+            .execution_options(synchronize_session=False, invalidates=())
+        )
+        if db.engine.dialect.update_returning:
+            statement = statement.returning(key, model.name, model.favorites_count)
+            counts[kind] = {row[0]: (row[1], row[2]) for row in db.session.execute(statement)}
+        else:
+            db.session.execute(statement)
+        db.session.info.setdefault('favorites_counts', []).append((kind, ids, delta, counts[kind]))
+    return counts
+
+# Rellena homeworld_id buscando `homeworld` entre los nombres de los planetas
+# (si hay varios con el mismo nombre, el de menor ID), con un solo UPDATE para
+# los personajes que cumplan `conditions` (todos si no se indica ninguna).
+def resolve_homeworld_ids(*conditions):
+    planet_id = (
+        db.select(db.func.min(Planets.planet_id))
+        .where(Planets.name == Characters.homeworld)
+        .scalar_subquery()
+    )
+    db.session.execute(
+        db.update(Characters).where(*conditions).values(homeworld_id=planet_id)
+        .execution_options(synchronize_session=False)
+    )
+
+# Enlaza los personajes sin homeworld_id cuyo `homeworld` es uno de `names`
+# (p. ej. al crear o renombrar planetas)
+def link_homeworlds(names):
+    names = [name for name in set(names) if name is not None]
+    if names:
+        resolve_homeworld_ids(Characters.homeworld_id.is_(None), Characters.homeworld.in_(names))
+
+# Recalcula todos los contadores desde Favorites (tarea de mantenimiento por si
+# se desajustan, p. ej. al borrar usuarios desde el admin)
+def rebuild_favorites_counts():
+    for model, key, column in ((Planets, Planets.planet_id, Favorites.planet_id),
+                               (Characters, Characters.character_id, Favorites.character_id)):
+        total = db.select(db.func.count()).where(column == key).scalar_subquery()
+        db.session.execute(
+            db.update(model).values(favorites_count=total)
+            .execution_options(synchronize_session=False, invalidates=())
+        )
+    db.session.commit()
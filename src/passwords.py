@@ -0,0 +1,65 @@
+"""
+Password hashing with a salted KDF (werkzeug's scrypt/pbkdf2) and a bounded
+thread pool for verification. hashlib releases the GIL while hashing, so the
+pool caps how many CPU cores logins can take without blocking other requests.
+"""
+import hmac
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Método y coste del KDF, p. ej. "scrypt:32768:8:1" o "pbkdf2:sha256:600000"
+PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+KDF_PREFIXES = ('scrypt:', 'pbkdf2:')
+
+
+class PasswordVerifierBusy(Exception):
+    pass
+
+
+def hash_password(password, method=None):
+    return generate_password_hash(password, method=method or PASSWORD_HASH_METHOD)
+
+def is_legacy_hash(stored):
+    # Las filas antiguas guardaban la contraseña en texto plano
+    return not stored.startswith(KDF_PREFIXES) or '$' not in stored
+
+def needs_rehash(stored, method=None):
+    return is_legacy_hash(stored) or not stored.startswith((method or PASSWORD_HASH_METHOD) + '$')
+
+def verify_password(stored, password):
+    if is_legacy_hash(stored):
+        return hmac.compare_digest(stored.encode(), password.encode())
+    return check_password_hash(stored, password)
+
+
+class PasswordVerifier:
+    # Como máximo `workers` hashes a la vez y `queue_size` esperando; si no hay
+    # hueco se lanza PasswordVerifierBusy en lugar de encolar sin límite
+    def __init__(self, workers=None, queue_size=None, timeout=10):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = self.workers * 4 if queue_size is None else queue_size
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password')
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_size)
+
+    def _run(self, function, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordVerifierBusy()
+        try:
+            future = self._pool.submit(function, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            raise PasswordVerifierBusy()
+
+    def verify(self, stored, password):
+        return self._run(verify_password, stored, password)
+
+    def hash(self, password):
+        return self._run(hash_password, password)
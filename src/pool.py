@@ -0,0 +1,62 @@
+"""
+SQLAlchemy engine options read from the environment and a QueuePool that
+publishes checkout wait time and pool exhaustion as metrics.
+"""
+import os
+import time
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+from metrics import REGISTRY
+
+POOL_CHECKOUT_SECONDS = REGISTRY.histogram(
+    'db_pool_checkout_seconds', 'Time spent waiting for a connection from the pool',
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30)
+)
+POOL_EXHAUSTED = REGISTRY.counter(
+    'db_pool_exhausted_total', 'Checkouts that found no idle connection and no overflow left'
+)
+POOL_TIMEOUTS = REGISTRY.counter(
+    'db_pool_timeouts_total', 'Checkouts that gave up after pool_timeout seconds'
+)
+
+
+class InstrumentedQueuePool(QueuePool):
+    def _do_get(self):
+        if self._pool.empty() and self._max_overflow > -1 and self._overflow >= self._max_overflow:
+            POOL_EXHAUSTED.inc()
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            POOL_TIMEOUTS.inc()
+            raise
+        finally:
+            POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - start)
+
+
+def register_pool_gauges(engine):
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return
+    REGISTRY.gauge('db_pool_size', 'Configured pool size', function=pool.size)
+    REGISTRY.gauge('db_pool_checked_out', 'Connections currently in use', function=pool.checkedout)
+    REGISTRY.gauge('db_pool_overflow', 'Connections opened above pool_size', function=pool.overflow)
+
+
+def engine_options_from_env(database_uri):
+    # Valores por defecto pensados para un worker de gunicorn (una petición a la vez
+    # en workers sync, unas pocas con gthread)
+    options = {
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', '1') == '1',
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+    }
+    # Con SQLite en memoria SQLAlchemy usa un pool propio (un único hilo/conexión)
+    if database_uri.startswith('sqlite') and ':memory:' in database_uri:
+        return options
+    options.update({
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 5)),
+        'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+    })
+    return options
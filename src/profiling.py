@@ -0,0 +1,157 @@
+"""
+Opt-in request profiling (PROFILING_ENABLED=1): per-route latency histograms,
+SQL statement count and time per request (SQLAlchemy cursor events), time
+spent in JWT decoding and JSON serialization, a Server-Timing header on every
+response and cProfile dumps of a sample of the slow requests.
+
+Dumps are written to PROFILING_DIR and can be read with `python -m pstats`
+or snakeviz.
+"""
+import contextlib
+import cProfile
+import os
+import random
+import time
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from metrics import REGISTRY
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    'http_request_duration_seconds', 'Request latency by route',
+    ('method', 'endpoint', 'status')
+)
+REQUEST_QUERIES = REGISTRY.histogram(
+    'http_request_db_queries', 'SQL statements executed per request', ('endpoint',),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100)
+)
+REQUEST_DB_SECONDS = REGISTRY.histogram(
+    'http_request_db_seconds', 'Time spent in SQL statements per request', ('endpoint',)
+)
+REQUEST_PHASE_SECONDS = REGISTRY.histogram(
+    'http_request_phase_seconds', 'Time spent per request in each instrumented phase',
+    ('endpoint', 'phase')
+)
+SLOW_PROFILES = REGISTRY.counter(
+    'http_request_slow_profiles_total', 'cProfile dumps written for slow requests', ('endpoint',)
+)
+
+
+def profiling_active():
+    return has_request_context() and 'profile_timings' in g
+
+
+# Suma a la petición actual el tiempo de un bloque (jwt, serialize...). Fuera
+# de una petición perfilada no hace nada; los bloques anidados con el mismo
+# nombre solo se cuentan una vez.
+@contextlib.contextmanager
+def timed(phase):
+    if not profiling_active() or phase in g.profile_open:
+        yield
+        return
+    g.profile_open.add(phase)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        g.profile_open.discard(phase)
+        g.profile_timings[phase] = g.profile_timings.get(phase, 0.0) + time.perf_counter() - start
+
+
+# Los eventos se registran para todos los engines (primario, réplicas...).
+# El inicio se guarda en el contexto de ejecución de la sentencia y no en la
+# conexión: after_cursor_execute no se llama si la sentencia falla, y en la
+# conexión (que vuelve al pool) quedarían inicios sueltos.
+@event.listens_for(Engine, 'before_cursor_execute')
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if profiling_active() and context is not None:
+        context.profile_query_start = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, 'profile_query_start', None)
+    if start is None or not profiling_active():
+        return
+    g.profile_queries += 1
+    g.profile_timings['db'] = g.profile_timings.get('db', 0.0) + time.perf_counter() - start
+
+
+def server_timing(timings, queries):
+    entries = []
+    for phase, seconds in timings.items():
+        entry = f"{phase};dur={seconds * 1000:.2f}"
+        if phase == 'db':
+            entry += f';desc="{queries} queries"'
+        entries.append(entry)
+    return ', '.join(entries)
+
+
+class RequestProfiler:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PROFILING_ENABLED', os.getenv('PROFILING_ENABLED', '0') == '1')
+        # Fracción de peticiones que se ejecutan bajo cProfile; solo se guardan
+        # las que tardan más de PROFILING_SLOW_SECONDS
+        app.config.setdefault('PROFILING_SAMPLE_RATE', float(os.getenv('PROFILING_SAMPLE_RATE', 0.01)))
+        app.config.setdefault('PROFILING_SLOW_SECONDS', float(os.getenv('PROFILING_SLOW_SECONDS', 0.5)))
+        app.config.setdefault('PROFILING_DIR', os.getenv('PROFILING_DIR', '/tmp/profiles'))
+        self.app = app
+        if not app.config['PROFILING_ENABLED']:
+            return
+        # Primero de la lista para que el tiempo incluya el resto de before_request
+        app.before_request_funcs.setdefault(None, []).insert(0, self.start_request)
+        app.after_request(self.finish_request)
+        app.teardown_request(self.stop_profiler)
+
+    def start_request(self):
+        g.profile_start = time.perf_counter()
+        g.profile_timings = {}
+        g.profile_open = set()
+        g.profile_queries = 0
+        g.profiler = None
+        if random.random() < self.app.config['PROFILING_SAMPLE_RATE']:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Desde Python 3.12 solo puede haber un perfilador activo por proceso
+                return
+            g.profiler = profiler
+
+    def finish_request(self, response):
+        if 'profile_start' not in g:
+            return response
+        elapsed = time.perf_counter() - g.profile_start
+        endpoint = request.endpoint or 'unknown'
+        timings = dict(g.profile_timings, app=elapsed)
+
+        REQUEST_SECONDS.observe(elapsed, method=request.method, endpoint=endpoint,
+                                status=response.status_code)
+        REQUEST_QUERIES.observe(g.profile_queries, endpoint=endpoint)
+        REQUEST_DB_SECONDS.observe(g.profile_timings.get('db', 0.0), endpoint=endpoint)
+        for phase, seconds in g.profile_timings.items():
+            if phase != 'db':
+                REQUEST_PHASE_SECONDS.observe(seconds, endpoint=endpoint, phase=phase)
+
+        response.headers['Server-Timing'] = server_timing(timings, g.profile_queries)
+        if g.profiler is not None:
+            self.stop_profiler()
+            if elapsed >= self.app.config['PROFILING_SLOW_SECONDS']:
+                self.dump_profile(g.profiler, endpoint, elapsed)
+        return response
+
+    def stop_profiler(self, exception=None):
+        profiler = g.get('profiler')
+        if profiler is not None:
+            profiler.disable()
+
+    def dump_profile(self, profiler, endpoint, elapsed):
+        directory = self.app.config['PROFILING_DIR']
+        os.makedirs(directory, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{endpoint}-{int(elapsed * 1000)}ms-{os.getpid()}.prof"
+        profiler.dump_stats(os.path.join(directory, name))
+        SLOW_PROFILES.inc(endpoint=endpoint)
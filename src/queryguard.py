@@ -0,0 +1,116 @@
+"""
+Query budget per request, for tests and staging. Counts the SQL statements a
+Flask request executes and reports the request when it goes over
+QUERY_GUARD_MAX_STATEMENTS or repeats the same statement more than
+QUERY_GUARD_MAX_REPEATS times (the usual N+1 shape). Reports include the
+route and the offending SQL.
+
+QUERY_GUARD=warn logs the report, QUERY_GUARD=raise also turns the response
+into a 500 with the report. It is off by default, and `raise` when the app
+runs with TESTING. Both settings are read on every request, so tests can set
+them after importing the app.
+"""
+import collections
+import os
+from flask import current_app, g, has_request_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from metrics import REGISTRY
+
+QUERY_GUARD_VIOLATIONS = REGISTRY.counter(
+    'query_guard_violations_total', 'Requests over the query budget', ('endpoint', 'reason')
+)
+
+
+# Cambia el presupuesto de una vista; None desactiva ese límite (p. ej. en las
+# rutas bulk, que escriben por lotes y repiten la misma sentencia a propósito)
+def query_budget(**limits):
+    def decorator(view):
+        view.query_budget = limits
+        return view
+    return decorator
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def record_statement(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'query_log' in g:
+        g.query_log.append(statement)
+
+
+class QueryGuard:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        # None: `raise` con TESTING y desactivado en otro caso
+        app.config.setdefault('QUERY_GUARD', os.getenv('QUERY_GUARD'))
+        app.config.setdefault('QUERY_GUARD_MAX_STATEMENTS', int(os.getenv('QUERY_GUARD_MAX_STATEMENTS', 10)))
+        app.config.setdefault('QUERY_GUARD_MAX_REPEATS', int(os.getenv('QUERY_GUARD_MAX_REPEATS', 3)))
+        app.before_request(self.start_request)
+        app.after_request(self.check_request)
+
+    def mode(self):
+        mode = current_app.config['QUERY_GUARD']
+        if mode is None:
+            mode = 'raise' if current_app.testing else 'off'
+        return mode
+
+    def start_request(self):
+        if self.mode() in ('warn', 'raise'):
+            g.query_log = []
+
+    def limits(self):
+        limits = {
+            'max_statements': current_app.config['QUERY_GUARD_MAX_STATEMENTS'],
+            'max_repeats': current_app.config['QUERY_GUARD_MAX_REPEATS'],
+        }
+        view = current_app.view_functions.get(request.endpoint)
+        limits.update(getattr(view, 'query_budget', {}))
+        return limits
+
+    def violations(self, statements):
+        limits = self.limits()
+        found = []
+        if limits['max_statements'] is not None and len(statements) > limits['max_statements']:
+            found.append({
+                'reason': 'too_many_statements',
+                'limit': limits['max_statements'],
+                'count': len(statements),
+                'statements': statements,
+            })
+        if limits['max_repeats'] is not None:
+            # Las sentencias van parametrizadas, así que el mismo texto es la misma "forma"
+            for statement, count in collections.Counter(statements).most_common():
+                if count <= limits['max_repeats']:
+                    break
+                found.append({
+                    'reason': 'repeated_statement',
+                    'limit': limits['max_repeats'],
+                    'count': count,
+                    'statements': [statement],
+                })
+        return found
+
+    def check_request(self, response):
+        statements = g.pop('query_log', None)
+        if not statements:
+            return response
+        found = self.violations(statements)
+        if not found:
+            return response
+
+        route = f"{request.method} {request.path} ({request.endpoint})"
+        for violation in found:
+            QUERY_GUARD_VIOLATIONS.inc(endpoint=request.endpoint, reason=violation['reason'])
+            current_app.logger.warning(
+                "Query guard: %s %s (%d > %d)\n%s",
+                route, violation['reason'], violation['count'], violation['limit'],
+                "\n".join(violation['statements'])
+            )
+
+        if self.mode() != 'raise':
+            return response
+        failure = jsonify({"message": "Query budget exceeded", "route": route, "violations": found})
+        failure.status_code = 500
+        return failure
@@ -0,0 +1,134 @@
+"""
+Rate limiting with GCRA (the generic cell rate algorithm, a token bucket that
+only stores one timestamp per key). Each key keeps its "theoretical arrival
+time"; a request is allowed if it does not get ahead of it by more than the
+burst. Stores: in memory (per process), a SQLite file shared by the workers of
+a host, or Redis (optional `redis` package) shared by every host.
+"""
+import math
+import sqlite3
+import threading
+import time
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+class RateLimitPolicy:
+    # "100/minute" o "100/minute:20" (ráfaga de 20 peticiones seguidas)
+    def __init__(self, spec):
+        rate, _, burst = spec.partition(':')
+        count, _, period = rate.partition('/')
+        if period not in PERIODS or int(count) < 1:
+            raise ValueError(f"Invalid rate limit: {spec}")
+        self.spec = spec
+        self.count = int(count)
+        self.period = PERIODS[period]
+        self.burst = int(burst) if burst else self.count
+        # Intervalo entre peticiones y margen que se permite adelantar
+        self.interval = self.period / self.count
+        self.tolerance = self.interval * (self.burst - 1)
+
+
+class MemoryRateLimitStore:
+    def __init__(self):
+        self._tat = {}
+        self._lock = threading.Lock()
+        self._calls = 0
+
+    def hit(self, key, policy, now):
+        with self._lock:
+            tat = max(self._tat.get(key, now), now)
+            if tat - now > policy.tolerance:
+                return tat - now - policy.tolerance
+            self._tat[key] = tat + policy.interval
+            self._calls += 1
+            # Limpieza periódica de las claves que ya no limitan nada
+            if self._calls % 10000 == 0:
+                self._tat = {k: v for k, v in self._tat.items() if v > now}
+            return 0
+
+
+class FileRateLimitStore:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limits (key TEXT PRIMARY KEY, tat REAL NOT NULL)"
+            )
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=OFF")
+            self._local.connection = connection
+        return connection
+
+    def hit(self, key, policy, now):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute("SELECT tat FROM rate_limits WHERE key = ?", (key,)).fetchone()
+            tat = max(row[0] if row else now, now)
+            if tat - now > policy.tolerance:
+                return tat - now - policy.tolerance
+            connection.execute(
+                "INSERT OR REPLACE INTO rate_limits (key, tat) VALUES (?, ?)",
+                (key, tat + policy.interval)
+            )
+            return 0
+        finally:
+            connection.execute("COMMIT")
+
+
+# El cálculo se hace dentro de Redis para que sea atómico entre workers
+GCRA_SCRIPT = """
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local tolerance = tonumber(ARGV[3])
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then tat = now end
+if tat - now > tolerance then
+    return tostring(tat - now - tolerance)
+end
+redis.call('SET', KEYS[1], tostring(tat + interval), 'PX', math.ceil((tat + interval - now) * 1000))
+return '0'
+"""
+
+class RedisRateLimitStore:
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RATELIMIT_STORAGE uses redis:// but the 'redis' package is not installed")
+        self.client = redis.Redis.from_url(url)
+        self.script = self.client.register_script(GCRA_SCRIPT)
+
+    def hit(self, key, policy, now):
+        return float(self.script(keys=[f"ratelimit:{key}"], args=[now, policy.interval, policy.tolerance]))
+
+
+def create_store(url):
+    # memory | file:///ruta/al/fichero.db | redis://host:6379/0
+    if not url or url == 'memory':
+        return MemoryRateLimitStore()
+    if url.startswith('file://'):
+        return FileRateLimitStore(url[len('file://'):])
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisRateLimitStore(url)
+    raise ValueError(f"Unknown rate limit storage: {url}")
+
+
+class RateLimiter:
+    def __init__(self, store, default, policies=None):
+        self.store = store
+        self.default = RateLimitPolicy(default)
+        self.policies = {endpoint: RateLimitPolicy(spec) for endpoint, spec in (policies or {}).items()}
+
+    # Devuelve 0 si la petición se permite o los segundos que hay que esperar
+    def hit(self, endpoint, client):
+        policy = self.policies.get(endpoint, self.default)
+        wait = self.store.hit(f"{endpoint}:{client}", policy, time.time())
+        return math.ceil(wait) if wait > 0 else 0
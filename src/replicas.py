@@ -0,0 +1,104 @@
+"""
+Read-replica routing. Read-only requests (GET/HEAD) are sent round-robin to the
+replicas in DATABASE_REPLICA_URLS; writes, sessions with pending changes and
+users that wrote in the last few seconds (read-your-writes) use the primary.
+Each request reads from a single replica, chosen at its first read. A replica
+that fails its health check, or a statement with an OperationalError, is
+skipped for a while and the request falls back to the next replica or to the
+primary.
+"""
+import itertools
+import threading
+import time
+from flask import current_app, g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+
+class ReplicaRouter:
+    def __init__(self, urls, engine_options=None, health_interval=5, retry_after=30):
+        self.engines = [create_engine(url, **(engine_options or {})) for url in urls]
+        self.health_interval = health_interval
+        self.retry_after = retry_after
+        self._checked_at = {}
+        self._down_until = {}
+        self._cycle = itertools.cycle(range(len(self.engines)))
+        self._lock = threading.Lock()
+
+    def _healthy(self, index):
+        now = time.monotonic()
+        if self._down_until.get(index, 0) > now:
+            return False
+        if now - self._checked_at.get(index, -self.health_interval) < self.health_interval:
+            return True
+        # Comprobación barata: la conexión vuelve al pool después del SELECT 1
+        try:
+            with self.engines[index].connect() as connection:
+                connection.execute(text("SELECT 1"))
+        except Exception:
+            self._down_until[index] = now + self.retry_after
+            return False
+        self._checked_at[index] = now
+        return True
+
+    # Siguiente réplica sana en orden round-robin, o None para usar el primario
+    def choose(self):
+        for _ in range(len(self.engines)):
+            with self._lock:
+                index = next(self._cycle)
+            if self._healthy(index):
+                return self.engines[index]
+        return None
+
+    def mark_down(self, engine):
+        self._down_until[self.engines.index(engine)] = time.monotonic() + self.retry_after
+
+    # Réplica de la petición actual (o None para el primario). Se elige en la
+    # primera lectura, después de que el handler haya leído las versiones de la
+    # caché, y se guarda en g para que todas las lecturas usen la misma.
+    def engine_for_request(self):
+        if 'replica_engine' not in g:
+            g.replica_engine = self.choose()
+        return g.replica_engine
+
+
+class RoutingSession(Session):
+    def replica_engine(self):
+        if has_app_context() and g.get('read_only') \
+                and not (self._flushing or self.new or self.dirty or self.deleted):
+            router = current_app.extensions.get('replica_router')
+            if router is not None:
+                return router.engine_for_request()
+        return None
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            engine = self.replica_engine()
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    # Si la réplica falla a mitad de petición se marca como caída y la lectura
+    # se repite en el primario. Solo se usan réplicas sin cambios pendientes en
+    # la sesión, así que deshacer la transacción no pierde nada.
+    def _with_replica_fallback(self, method, *args, **kwargs):
+        try:
+            return method(*args, **kwargs)
+        except OperationalError:
+            engine = self.replica_engine()
+            if engine is None:
+                raise
+            current_app.extensions['replica_router'].mark_down(engine)
+            g.replica_engine = None
+            self.rollback()
+            return method(*args, **kwargs)
+
+    def execute(self, *args, **kwargs):
+        return self._with_replica_fallback(super().execute, *args, **kwargs)
+
+    def scalar(self, *args, **kwargs):
+        return self._with_replica_fallback(super().scalar, *args, **kwargs)
+
+    def scalars(self, *args, **kwargs):
+        return self._with_replica_fallback(super().scalars, *args, **kwargs)
@@ -0,0 +1,78 @@
+"""
+Prefix name search over characters and planets. Postgres uses a GIN index on
+to_tsvector('simple', name); SQLite uses FTS5 external-content tables kept in
+sync with triggers. Any other engine falls back to a LIKE prefix match.
+"""
+import re
+from sqlalchemy import DDL, event, text
+from models import db, Characters, Planets
+
+# (tabla, clave primaria) de cada recurso buscable
+SEARCH_TABLES = {
+    'characters': ('characters', 'character_id'),
+    'planets': ('planets', 'planet_id'),
+}
+
+def sqlite_ddl(table, key):
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5("
+        f"name, content='{table}', content_rowid='{key}', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_fts_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {table}_fts(rowid, name) VALUES (new.{key}, new.name); END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_fts_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {table}_fts({table}_fts, rowid, name) VALUES ('delete', old.{key}, old.name); END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_fts_au AFTER UPDATE OF name ON {table} BEGIN "
+        f"INSERT INTO {table}_fts({table}_fts, rowid, name) VALUES ('delete', old.{key}, old.name); "
+        f"INSERT INTO {table}_fts(rowid, name) VALUES (new.{key}, new.name); END",
+    ]
+
+def postgresql_ddl(table, key):
+    return [
+        f"CREATE INDEX IF NOT EXISTS ix_{table}_name_fts ON {table} "
+        f"USING gin (to_tsvector('simple', name))",
+    ]
+
+# Los índices de búsqueda también se crean con db.create_all()
+for model in (Characters, Planets):
+    table, key = SEARCH_TABLES[model.__tablename__]
+    for statement in sqlite_ddl(table, key):
+        event.listen(model.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+    for statement in postgresql_ddl(table, key):
+        event.listen(model.__table__, 'after_create', DDL(statement).execute_if(dialect='postgresql'))
+
+
+def search_terms(query):
+    # Palabras alfanuméricas del texto buscado; cualquier otro carácter se ignora
+    return re.findall(r'\w+', query.lower())[:8]
+
+def search(resource, query, limit):
+    terms = search_terms(query)
+    if not terms:
+        return []
+    table, key = SEARCH_TABLES[resource]
+    dialect = db.engine.dialect.name
+
+    if dialect == 'postgresql':
+        statement = text(
+            f"SELECT {key}, name FROM {table}, to_tsquery('simple', :query) AS query "
+            f"WHERE to_tsvector('simple', name) @@ query "
+            f"ORDER BY ts_rank(to_tsvector('simple', name), query) DESC, name, {key} LIMIT :limit"
+        )
+        params = {'query': ' & '.join(f"{term}:*" for term in terms)}
+    elif dialect == 'sqlite':
+        # bm25 devuelve valores más bajos para los mejores resultados
+        statement = text(
+            f"SELECT rowid AS {key}, name FROM {table}_fts WHERE {table}_fts MATCH :query "
+            f"ORDER BY bm25({table}_fts), name, rowid LIMIT :limit"
+        )
+        params = {'query': ' '.join(f'"{term}"*' for term in terms)}
+    else:
+        statement = text(
+            f"SELECT {key}, name FROM {table} WHERE lower(name) LIKE :query "
+            f"ORDER BY name, {key} LIMIT :limit"
+        )
+        params = {'query': ' '.join(terms) + '%'}
+
+    rows = db.session.execute(statement, dict(params, limit=limit))
+    return [{key: row[0], 'name': row[1]} for row in rows]
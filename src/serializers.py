@@ -0,0 +1,106 @@
+"""
+Schema-driven serialization: each resource declares its public fields once,
+handlers select only those columns (row tuples instead of ORM instances) and
+responses are encoded with orjson when it is installed.
+"""
+import json
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+from utils import APIException
+from models import Characters, Planets, Users
+from profiling import timed
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional, sin él se usa json de la librería estándar
+    orjson = None
+
+
+class Serializer:
+    def __init__(self, model, fields):
+        self.model = model
+        self.fields = tuple(fields)
+        self.columns = {field: getattr(model, field) for field in self.fields}
+
+    # Lee ?fields=a,b y devuelve la tupla de campos pedidos (todos por defecto)
+    def requested_fields(self, args=None):
+        raw = (request.args if args is None else args).get('fields')
+        if not raw:
+            return self.fields
+        fields = tuple(dict.fromkeys(field.strip() for field in raw.split(',') if field.strip()))
+        unknown = [field for field in fields if field not in self.columns]
+        if unknown or not fields:
+            raise APIException(
+                "Unknown fields: " + ", ".join(unknown) if unknown else "fields cannot be empty",
+                status_code=400,
+                payload={'allowed_fields': list(self.fields)}
+            )
+        return fields
+
+    # Columnas a seleccionar; las columnas extra (p. ej. la clave del cursor) van al
+    # final para que zip() las descarte al construir la salida
+    def columns_for(self, fields, *extra):
+        names = fields + tuple(name for name in extra if name not in fields)
+        return [self.columns[name] for name in names]
+
+    def one(self, row, fields=None):
+        return dict(zip(fields or self.fields, row))
+
+    def many(self, rows, fields=None):
+        fields = fields or self.fields
+        with timed('serialize'):
+            return [dict(zip(fields, row)) for row in rows]
+
+    # Proyección de un diccionario ya serializado (p. ej. leído de la caché)
+    def project(self, data, fields):
+        if fields == self.fields:
+            return data
+        return {field: data[field] for field in fields}
+
+
+character_serializer = Serializer(
+    Characters, ('character_id', 'name', 'species', 'homeworld', 'homeworld_id', 'gender')
+)
+planet_serializer = Serializer(
+    Planets, ('planet_id', 'name', 'climate', 'terrain', 'population')
+)
+user_serializer = Serializer(
+    Users, ('user_id', 'email', 'username', 'user_creation_date')
+)
+
+
+def dumps(obj, default=None):
+    if orjson is not None:
+        return orjson.dumps(obj, default=default, option=orjson.OPT_PASSTHROUGH_DATETIME).decode()
+    return json.dumps(obj, default=default)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    # Mismo formato que el proveedor por defecto de Flask (claves ordenadas,
+    # fechas HTTP) pero codificado con orjson cuando está disponible
+    def dumps(self, obj, **kwargs):
+        with timed('serialize'):
+            if orjson is None or kwargs:
+                return super().dumps(obj, **kwargs)
+            return self._orjson_dumps(obj).decode()
+
+    def _orjson_dumps(self, obj):
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self._default, option=option)
+
+    @staticmethod
+    def _default(value):
+        if hasattr(value, 'utctimetuple'):
+            return http_date(value)
+        return DefaultJSONProvider.default(value)
+
+    def response(self, *args, **kwargs):
+        if orjson is None or self._app.debug:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        with timed('serialize'):
+            body = self._orjson_dumps(obj) + b"\n"
+        return self._app.response_class(body, mimetype=self.mimetype)
@@ -0,0 +1,78 @@
+"""
+JWT helpers: a JWTManager that caches verified claims per token and a
+revocation list (in memory or on a shared cache backend) for the blocklist
+loader.
+"""
+import hashlib
+import threading
+import time
+from flask_jwt_extended import JWTManager
+from cache import FileBackend, LRUCache, MISSING, create_backend
+from profiling import timed
+
+
+class CachingJWTManager(JWTManager):
+    # Guarda los claims ya verificados por hash del token, como mucho hasta su `exp`,
+    # para no repetir el decode y la firma HMAC en cada petición con el mismo token
+    def __init__(self, app=None, cache_size=10000, cache_ttl=300):
+        self.token_cache = LRUCache(cache_size, cache_ttl)
+        super().__init__(app)
+
+    def _decode_jwt_from_config(self, encoded_token, csrf_value=None, allow_expired=False):
+        if csrf_value is not None or allow_expired:
+            return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+
+        key = hashlib.sha256(encoded_token.encode()).digest()
+        claims = self.token_cache.get(key)
+        if claims is not MISSING:
+            return claims
+
+        with timed('jwt'):
+            claims = super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+        ttl = self.token_cache.ttl
+        if 'exp' in claims:
+            ttl = min(ttl, claims['exp'] - time.time())
+        if ttl > 0:
+            self.token_cache.set(key, claims, ttl)
+        return claims
+
+
+class MemoryBlocklist:
+    # Solo para un proceso: en varios workers usar un backend compartido
+    def __init__(self):
+        self._revoked = {}
+        self._lock = threading.Lock()
+
+    def revoke(self, jti, expires_at):
+        with self._lock:
+            now = time.time()
+            self._revoked = {key: exp for key, exp in self._revoked.items() if exp > now}
+            self._revoked[jti] = expires_at
+
+    def is_revoked(self, jti):
+        expires_at = self._revoked.get(jti)
+        return expires_at is not None and expires_at > time.time()
+
+
+class SharedBlocklist:
+    # Las entradas caducan solas cuando el token ya no sería válido
+    def __init__(self, backend):
+        self.backend = backend
+
+    def revoke(self, jti, expires_at):
+        self.backend.set(f"revoked:{jti}", 1, max(1, int(expires_at - time.time()) + 1))
+
+    def is_revoked(self, jti):
+        return self.backend.get(f"revoked:{jti}") is not MISSING
+
+
+def create_blocklist(url):
+    if not url or url == 'memory':
+        return MemoryBlocklist()
+    # Las revocaciones van en su propia tabla, sin límite de tamaño: aunque el
+    # fichero sea el mismo que el de CACHE_BACKEND, la limpieza de la caché de
+    # respuestas no las puede expulsar (solo se borran al caducar el token).
+    # En Redis solo caducan por su TTL.
+    if url.startswith('file://'):
+        return SharedBlocklist(FileBackend(url[len('file://'):], maxsize=None, table='revoked_tokens'))
+    return SharedBlocklist(create_backend(url))
@@ -1,4 +1,9 @@
-from flask import jsonify, url_for
+import base64
+import hashlib
+import json
+import operator
+from flask import jsonify, url_for, request, make_response
+from sqlalchemy import and_, or_
 
 class APIException(Exception):
     status_code = 400
@@ -15,6 +20,142 @@ class APIException(Exception):
         rv['message'] = self.message
         return rv
 
+# Paginación por cursor (keyset): el cursor es opaco para el cliente y
+# guarda los valores de la clave del último registro devuelto.
+
+def encode_cursor(values):
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except ValueError:
+        raise APIException("Invalid cursor", status_code=400)
+    if not isinstance(values, list):
+        raise APIException("Invalid cursor", status_code=400)
+    return values
+
+# Las funciones que leen la query string aceptan `args` para poder usarse fuera
+# de Flask (p. ej. desde asgi.py); por defecto usan request.args
+
+def get_page_limit(default, maximum, args=None):
+    limit = (request.args if args is None else args).get('limit')
+    if limit is None:
+        return default
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise APIException("limit must be an integer", status_code=400)
+    if limit < 1:
+        raise APIException("limit must be greater than 0", status_code=400)
+    return min(limit, maximum)
+
+# Los valores del cursor vienen del cliente: deben ser del tipo de la columna
+# (str o int, este dentro de 64 bits) antes de llegar a la base de datos
+def cursor_value_ok(value, column):
+    if not isinstance(value, column.type.python_type) or isinstance(value, bool):
+        return False
+    return not isinstance(value, int) or -2 ** 63 <= value < 2 ** 63
+
+def keyset_query(query, key_column, limit, after=None, sort_column=None, descending=False):
+    # Sin sort_column el cursor es [id]; con sort_column es [valor, id] y el id
+    # desempata. Los NULL de sort_column van siempre al final. Sirve tanto para
+    # Query como para select().
+    if sort_column is key_column:
+        sort_column = None
+    order = (lambda column: column.desc()) if descending else (lambda column: column.asc())
+    if after is not None:
+        values = decode_cursor(after)
+        size = 1 if sort_column is None else 2
+        if len(values) != size or not cursor_value_ok(values[-1], key_column) \
+                or (sort_column is not None and values[0] is not None
+                    and not cursor_value_ok(values[0], sort_column)):
+            raise APIException("Invalid cursor", status_code=400)
+        after_key = key_column < values[-1] if descending else key_column > values[-1]
+        if sort_column is None:
+            query = query.filter(after_key)
+        elif values[0] is None:
+            query = query.filter(sort_column.is_(None), after_key)
+        else:
+            after_sort = sort_column < values[0] if descending else sort_column > values[0]
+            query = query.filter(or_(
+                after_sort,
+                and_(sort_column == values[0], after_key),
+                sort_column.is_(None)
+            ))
+
+    if sort_column is None:
+        query = query.order_by(order(key_column))
+    else:
+        query = query.order_by(order(sort_column).nulls_last(), order(key_column))
+    # Se pide un registro de más para saber si hay otra página
+    return query.limit(limit + 1)
+
+def keyset_result(rows, limit, key_column, sort_column=None):
+    if sort_column is key_column:
+        sort_column = None
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        values = [getattr(last, key_column.key)]
+        if sort_column is not None:
+            values.insert(0, getattr(last, sort_column.key))
+        next_cursor = encode_cursor(values)
+    return rows, next_cursor
+
+# ?sort=campo o ?sort=-campo (descendente) limitado a las columnas permitidas
+def get_sort(allowed, args=None):
+    raw = (request.args if args is None else args).get('sort')
+    if not raw:
+        return None, False
+    descending = raw.startswith('-')
+    name = raw[1:] if descending else raw
+    if name not in allowed:
+        raise APIException(
+            f"Cannot sort by '{name}'", status_code=400, payload={'allowed_sort': list(allowed)}
+        )
+    return allowed[name], descending
+
+# Filtros por igualdad (?species=Human) y por rango (?population_min=&population_max=)
+def apply_filters(query, equality=None, ranges=None, args=None):
+    args = request.args if args is None else args
+    for name, column in (equality or {}).items():
+        value = args.get(name)
+        if value is not None:
+            query = query.filter(column == value)
+    for name, column in (ranges or {}).items():
+        for suffix, compare in (('_min', operator.ge), ('_max', operator.le)):
+            raw = args.get(name + suffix)
+            if raw is None:
+                continue
+            try:
+                value = int(raw)
+            except ValueError:
+                raise APIException(f"{name}{suffix} must be an integer", status_code=400)
+            query = query.filter(compare(column, value))
+    return query
+
+# ETag fuerte a partir de las versiones de las tablas y de la URL pedida
+def make_etag(*parts):
+    return hashlib.sha1(":".join(str(part) for part in parts).encode()).hexdigest()
+
+# Respuesta 304 si el cliente ya tiene esa versión, o None si hay que responder
+# (también si no hay ETag)
+def not_modified(etag):
+    if etag is not None and request.if_none_match.contains_weak(etag):
+        response = make_response('', 304)
+        response.set_etag(etag)
+        return response
+    return None
+
+def with_etag(response, etag):
+    if etag is not None:
+        response.set_etag(etag)
+    return response
+
 def has_no_empty_params(rule):
     defaults = rule.defaults if rule.defaults is not None else ()
     arguments = rule.arguments if rule.arguments is not None else ()
@@ -0,0 +1,20 @@
+import time
+from cache import create_backend
+from tokens import create_blocklist
+
+
+def test_revocation_survives_cache_eviction(tmp_path):
+    url = f"file://{tmp_path / 'cache.sqlite3'}"
+    blocklist = create_blocklist(url)
+    blocklist.revoke('revoked-jti', time.time() + 3600)
+
+    # Misma URL que CACHE_BACKEND: llenar la caché de respuestas por encima de
+    # maxsize dispara su limpieza, que no debe tocar las revocaciones
+    cache = create_backend(url, maxsize=10)
+    for i in range(500):
+        cache.set(f"response:{i}", i, 3600)
+    assert cache.stats()['size'] <= 100
+
+    assert blocklist.is_revoked('revoked-jti')
+    assert create_blocklist(url).is_revoked('revoked-jti')
+    assert not blocklist.is_revoked('other-jti')
@@ -0,0 +1,33 @@
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine
+from cache import MISSING, DatabaseVersions, MemoryBackend, VersionedCache
+
+
+def make_versions(tmp_path):
+    metadata = MetaData()
+    table = Table('cache_versions', metadata,
+                  Column('namespace', String(120), primary_key=True),
+                  Column('version', Integer, nullable=False))
+    engine = create_engine(f"sqlite:///{tmp_path / 'api.db'}")
+    metadata.create_all(engine)
+    return DatabaseVersions(engine, table)
+
+
+def test_workers_share_database_versions(tmp_path):
+    versions = make_versions(tmp_path)
+    # Dos workers: cada uno con su caché en memoria y las versiones en la base de datos
+    first = VersionedCache(MemoryBackend(versions=versions), 'planets')
+    second = VersionedCache(MemoryBackend(versions=versions), 'planets')
+    assert first.backend.shared_versions and not first.backend.shared
+
+    version = second.version()
+    second.set('list', ['Tatooine'], version)
+    assert first.invalidate() == version + 1
+    assert second.version() == version + 1
+    assert second.get('list', second.version()) is MISSING
+    assert first.invalidate() == version + 2
+
+
+def test_memory_versions_are_per_process():
+    backend = MemoryBackend()
+    assert not backend.shared_versions
+    assert backend.bump_version('planets') == backend.get_version('planets')